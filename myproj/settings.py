@@ -198,4 +198,33 @@ CELERY_BROKER_URL = 'redis://localhost:6379/0'  # Redis URL (local server, port
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'  # Redis as the result backend
-CELERY_TIMEZONE = 'UTC'  # Set to your timezone (optional)
\ No newline at end of file
+CELERY_TIMEZONE = 'UTC'  # Set to your timezone (optional)
+
+# Scraper rate limiting, shared by commands and Celery workers through Redis
+SCRAPER_RATE_LIMIT_BACKEND = 'redis'
+SCRAPER_RATE_LIMITS = {  # Starting requests per second for each host
+    'just-wiped.net': 1.0,
+    'www.battlemetrics.com': 0.5,
+    'api.battlemetrics.com': 2.0,
+}
+
+# /servers pagination: default page size and the cap on ?page_size=
+SERVERS_PAGE_SIZE = 50
+SERVERS_MAX_PAGE_SIZE = 500
+
+# Cache for API responses (servers.response_cache); entries are retired by a
+# generation counter the scrapers bump after each write
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://localhost:6379/1',
+    }
+}
+API_CACHE_TIMEOUT = 3600
+
+# Which source wins when several report different values for the same server (first = highest)
+INGESTION_SOURCE_PRIORITY = ['fetch_api_servers', 'recent_wipes', 'upcoming_wipes', 'scrape_battlemetrics']
+
+# wipe_events weekly partitions: how far ahead they are created and how long they are kept
+WIPE_EVENT_PARTITIONS_AHEAD = 4
+WIPE_EVENT_RETENTION_WEEKS = 52
@@ -0,0 +1,99 @@
+from collections import Counter
+
+from django.conf import settings
+
+from servers.ingestion import ingest_servers
+
+# Highest priority first: its non-empty values win when sources disagree about a server
+DEFAULT_SOURCE_PRIORITY = ['fetch_api_servers', 'recent_wipes', 'upcoming_wipes', 'scrape_battlemetrics']
+
+MERGED_FIELDS = ('server_name', 'max_group')
+
+
+class IngestionCoordinator:
+    """Merges the scraped server dicts of every source in a run, then writes them in one batch.
+
+    For the name and group size the value from the highest-priority
+    source that had one wins (INGESTION_SOURCE_PRIORITY; unknown sources
+    rank last, ties go to the first value seen). Wipe times are not ranked:
+    every distinct one is kept with the source that reported it, so each
+    source's weekly slot is still recorded.
+    """
+
+    def __init__(self, priority=None):
+        priority = priority or getattr(settings, 'INGESTION_SOURCE_PRIORITY', DEFAULT_SOURCE_PRIORITY)
+        self.ranks = {source: rank for rank, source in enumerate(priority)}
+        self._servers = {}
+        self._field_ranks = {}
+        self._wipes = {}  # server_id -> {wiped_at: source}
+        self.received = Counter()
+        self.duplicates = 0
+
+    def rank(self, source):
+        return self.ranks.get(source, len(self.ranks))
+
+    def add(self, source, servers_data):
+        """Folds one source's server dicts into the run."""
+        rank = self.rank(source)
+        for server in servers_data:
+            self.received[source] += 1
+            server_id = server["server_id"]
+            merged = self._servers.get(server_id)
+            if merged is None:
+                self._servers[server_id] = {
+                    "server_id": server_id,
+                    "server_name": server.get("server_name"),
+                    "max_group": server.get("max_group"),
+                    "is_existing": server.get("is_existing", False),
+                    "sources": [source],
+                }
+                self._field_ranks[server_id] = {
+                    field: rank for field in MERGED_FIELDS if server.get(field) is not None
+                }
+                self._wipes[server_id] = {}
+                self._add_wipe(server_id, server.get("wiped_at"), source, rank)
+                continue
+
+            self.duplicates += 1
+            field_ranks = self._field_ranks[server_id]
+            for field in MERGED_FIELDS:
+                value = server.get(field)
+                if value is not None and rank < field_ranks.get(field, len(self.ranks) + 1):
+                    merged[field] = value
+                    field_ranks[field] = rank
+            self._add_wipe(server_id, server.get("wiped_at"), source, rank)
+            merged["is_existing"] = merged["is_existing"] or server.get("is_existing", False)
+            if source not in merged["sources"]:
+                merged["sources"].append(source)
+
+    def _add_wipe(self, server_id, wiped_at, source, rank):
+        """Keeps a wipe time, credited to the highest-priority source that reported exactly it."""
+        if wiped_at is None:
+            return
+        wipes = self._wipes[server_id]
+        if wiped_at not in wipes or rank < self.rank(wipes[wiped_at]):
+            wipes[wiped_at] = source
+
+    def __len__(self):
+        return len(self._servers)
+
+    def servers_data(self):
+        """One dict per distinct wipe of each server, all carrying its merged name and group size."""
+        servers_data = []
+        for server_id, merged in self._servers.items():
+            wipes = self._wipes[server_id] or {None: None}
+            for wiped_at, source in wipes.items():
+                servers_data.append(dict(merged, wiped_at=wiped_at, source=source))
+        return servers_data
+
+    def write(self, server_index=None, dry_run=False):
+        """Writes every merged server with one ingest_servers call and empties the run."""
+        result = ingest_servers(self.servers_data(), server_index, dry_run=dry_run)
+        self._servers = {}
+        self._field_ranks = {}
+        self._wipes = {}
+        return result
+
+    def summary(self):
+        per_source = ', '.join(f"{source}: {count}" for source, count in sorted(self.received.items()))
+        return f"{sum(self.received.values())} rows from {per_source or 'no sources'} merged into {len(self)} servers"
@@ -0,0 +1,335 @@
+import codecs
+import json
+from collections import namedtuple
+from datetime import datetime
+from html.parser import HTMLParser
+
+from bs4 import BeautifulSoup
+from django.conf import settings
+
+# One server card as read from a listing page
+ServerRecord = namedtuple('ServerRecord', ['server_id', 'server_name', 'max_group', 'rating', 'wipe_dt'])
+
+# Everything the scrapers need from one page, produced by a single parse
+PageExtract = namedtuple('PageExtract', ['records', 'has_servers'])
+
+JUST_WIPED_LINK_SELECTOR = 'a[title="Open the server details page"]'
+BATTLEMETRICS_CELL_SELECTOR = 'td.css-1su1bxu'
+# JSON:API state the BattleMetrics page is rendered from, same server objects as the public API
+BATTLEMETRICS_STORE_SELECTOR = 'script#storeBootstrap'
+
+BACKENDS = ('selectolax', 'lxml', 'html.parser')
+
+_backend = None
+
+
+class _SoupNode:
+    """BeautifulSoup tag behind the small node API the extractors use."""
+
+    __slots__ = ('tag',)
+
+    def __init__(self, tag):
+        self.tag = tag
+
+    def css(self, selector):
+        return [_SoupNode(tag) for tag in self.tag.select(selector)]
+
+    def css_first(self, selector):
+        tag = self.tag.select_one(selector)
+        return _SoupNode(tag) if tag is not None else None
+
+    def attr(self, name):
+        return self.tag.get(name)
+
+    def text(self):
+        return self.tag.get_text().strip()
+
+
+class _SelectolaxNode:
+    """selectolax node behind the same API as _SoupNode."""
+
+    __slots__ = ('node',)
+
+    def __init__(self, node):
+        self.node = node
+
+    def css(self, selector):
+        return [_SelectolaxNode(node) for node in self.node.css(selector)]
+
+    def css_first(self, selector):
+        node = self.node.css_first(selector)
+        return _SelectolaxNode(node) if node is not None else None
+
+    def attr(self, name):
+        return self.node.attributes.get(name)
+
+    def text(self):
+        return self.node.text().strip()
+
+
+def _available(backend):
+    try:
+        if backend == 'selectolax':
+            import selectolax.parser  # noqa: F401
+        elif backend == 'lxml':
+            import lxml  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def get_backend():
+    """The fastest installed parser, or SCRAPER_HTML_BACKEND when it is set and installed."""
+    global _backend
+    if _backend is None:
+        preferred = getattr(settings, 'SCRAPER_HTML_BACKEND', None)
+        candidates = ((preferred,) if preferred else ()) + BACKENDS
+        _backend = next(backend for backend in candidates if _available(backend))
+    return _backend
+
+
+def parse_document(html, backend=None):
+    """Parses a document once and returns its root node."""
+    backend = backend or get_backend()
+    if backend == 'selectolax':
+        from selectolax.parser import HTMLParser
+        return _SelectolaxNode(HTMLParser(html).root)
+    return _SoupNode(BeautifulSoup(html, backend))
+
+
+def max_group_from_name(server_name):
+    """Determine max group size from server name, prioritizing larger groups."""
+    name_lower = server_name.lower()
+    # Check in order from largest to smallest group size
+    if 'quad' in name_lower:
+        return 4
+    elif 'trio' in name_lower:
+        return 3
+    elif 'duo' in name_lower:
+        return 2
+    elif 'solo' in name_lower:
+        return 1
+    return None
+
+
+def _server_id_from_href(href):
+    try:
+        return int((href or '').rstrip('/').split('/')[-1])
+    except ValueError:
+        return None
+
+
+def _int_text(text):
+    text = (text or '').replace('%', '')
+    return int(text) if text.isdigit() else None
+
+
+def _int_value(card, selector):
+    """Integer inside `<selector> div.value` of a card, ignoring a trailing %."""
+    value = card.css_first(f'{selector} div.value')
+    if value is None:
+        return None
+    return _int_text(value.text())
+
+
+def _parse_timestamp(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+
+def extract_just_wiped(html, backend=None):
+    """Walks every server card of a Just-Wiped listing once."""
+    root = parse_document(html, backend)
+    has_servers = root.css_first(JUST_WIPED_LINK_SELECTOR) is not None
+    records = []
+
+    for card in root.css('div.server'):
+        link = card.css_first(JUST_WIPED_LINK_SELECTOR)
+        if link is None:
+            continue
+        server_id = _server_id_from_href(link.attr('href'))
+        if server_id is None:
+            continue
+
+        server_name = link.text()
+        timeago = card.css_first('time.timeago')
+        name_group = max_group_from_name(server_name)
+        records.append(ServerRecord(
+            server_id=server_id,
+            server_name=server_name,
+            max_group=name_group if name_group is not None else _int_value(card, 'div.sinfo.i-max-group'),
+            rating=_int_value(card, 'div.sinfo.i-rating') or 0,
+            wipe_dt=_parse_timestamp(timeago.attr('datetime')) if timeago is not None else None
+        ))
+
+    return PageExtract(records, has_servers)
+
+
+def _battlemetrics_wipe_times(root):
+    """server_id -> last wipe (or first seen) time from the page's embedded store."""
+    store = root.css_first(BATTLEMETRICS_STORE_SELECTOR)
+    if store is None:
+        return {}
+    try:
+        pending = [json.loads(store.text())]
+    except ValueError:
+        return {}
+
+    wipe_times = {}
+    while pending:
+        value = pending.pop()
+        if isinstance(value, list):
+            pending.extend(value)
+            continue
+        if not isinstance(value, dict):
+            continue
+        attributes = value.get('attributes')
+        if value.get('type') == 'server' and isinstance(attributes, dict):
+            details = attributes.get('details') or {}
+            wipe_dt = _parse_timestamp(details.get('rust_last_wipe') or details.get('rust_born'))
+            server_id = _server_id_from_href(str(value.get('id', '')))
+            if wipe_dt is not None and server_id is not None:
+                wipe_times[server_id] = wipe_dt
+        pending.extend(value.values())
+    return wipe_times
+
+
+def extract_battlemetrics(html, backend=None):
+    """Walks every server cell of a BattleMetrics listing once.
+
+    The wipe time comes from the embedded store, or from a <time datetime>
+    in the cell; it is None when neither has one.
+    """
+    root = parse_document(html, backend)
+    cells = root.css(BATTLEMETRICS_CELL_SELECTOR)
+    wipe_times = _battlemetrics_wipe_times(root) if cells else {}
+    records = []
+
+    for cell in cells:
+        link = cell.css_first('a')
+        if link is None:
+            continue
+        server_id = _server_id_from_href(link.attr('href'))
+        if server_id is None:
+            continue
+
+        server_name = link.text()
+        wipe_dt = wipe_times.get(server_id)
+        if wipe_dt is None:
+            time_node = cell.css_first('time[datetime]')
+            wipe_dt = _parse_timestamp(time_node.attr('datetime')) if time_node is not None else None
+        records.append(ServerRecord(
+            server_id=server_id,
+            server_name=server_name,
+            max_group=max_group_from_name(server_name),
+            rating=None,
+            wipe_dt=wipe_dt
+        ))
+
+    return PageExtract(records, bool(cells))
+
+
+class JustWipedStreamParser(HTMLParser):
+    """Event-driven reader for Just-Wiped cards, fed one chunk of text at a time.
+
+    Only the fields of the card being read are kept; a record is appended
+    to `records` when its `div.server` closes, with the same values
+    extract_just_wiped() would produce.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.records = []
+        self._div_depth = 0
+        self._card = None
+        self._card_depth = None
+        self._info = None  # 'rating' or 'max_group' while inside that div.sinfo
+        self._info_depth = None
+        self._capture = None  # (field, tag, div depth) whose text is being collected
+        self._text = []
+
+    def take(self):
+        """Returns the records completed so far and forgets them."""
+        records, self.records = self.records, []
+        return records
+
+    def _start_capture(self, field, tag):
+        self._capture = (field, tag, self._div_depth)
+        self._text = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = (attrs.get('class') or '').split()
+        if tag == 'div':
+            self._div_depth += 1
+            if self._card is None:
+                if 'server' in classes:
+                    self._card = {}
+                    self._card_depth = self._div_depth
+            elif 'sinfo' in classes:
+                self._info = 'rating' if 'i-rating' in classes else 'max_group' if 'i-max-group' in classes else None
+                self._info_depth = self._div_depth
+            elif 'value' in classes and self._info and self._info not in self._card:
+                self._start_capture(self._info, 'div')
+        elif tag == 'a' and self._card is not None and 'href' not in self._card:
+            if attrs.get('title') == 'Open the server details page':
+                self._card['href'] = attrs.get('href')
+                self._start_capture('name', 'a')
+        elif tag == 'time' and self._card is not None and 'timeago' in classes and 'datetime' not in self._card:
+            self._card['datetime'] = attrs.get('datetime')
+
+    def handle_data(self, data):
+        if self._capture:
+            self._text.append(data)
+
+    def handle_endtag(self, tag):
+        if self._capture:
+            field, capture_tag, depth = self._capture
+            if tag == capture_tag and (tag != 'div' or self._div_depth == depth):
+                self._card[field] = ''.join(self._text).strip()
+                self._capture = None
+        if tag != 'div' or self._div_depth == 0:
+            return
+        if self._card is not None:
+            if self._div_depth == self._info_depth:
+                self._info = self._info_depth = None
+            if self._div_depth == self._card_depth:
+                self._finish_card()
+        self._div_depth -= 1
+
+    def _finish_card(self):
+        card, self._card = self._card, None
+        self._card_depth = self._info = self._info_depth = self._capture = None
+        server_id = _server_id_from_href(card.get('href')) if 'href' in card else None
+        if server_id is None:
+            return
+
+        server_name = card.get('name', '')
+        name_group = max_group_from_name(server_name)
+        self.records.append(ServerRecord(
+            server_id=server_id,
+            server_name=server_name,
+            max_group=name_group if name_group is not None else _int_text(card.get('max_group')),
+            rating=_int_text(card.get('rating')) or 0,
+            wipe_dt=_parse_timestamp(card.get('datetime'))
+        ))
+
+
+def stream_just_wiped(chunks, encoding='utf-8'):
+    """Yields the ServerRecords of a Just-Wiped listing while it downloads.
+
+    Only the current chunk and the parser's unfinished tag are in memory,
+    never the whole page.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    parser = JustWipedStreamParser()
+    for chunk in chunks:
+        parser.feed(decoder.decode(chunk) if isinstance(chunk, bytes) else chunk)
+        yield from parser.take()
+    parser.feed(decoder.decode(b'', final=True))
+    parser.close()
+    yield from parser.take()
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import os
+import threading
+
+from django.conf import settings
+
+# Returned by fetchers instead of HTML when the page did not change since the last run
+NOT_MODIFIED = object()
+
+REDIS_KEY = 'scraper:http-cache'
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+class FileBackend:
+    """One small JSON file per URL under `directory`."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url):
+        return os.path.join(self.directory, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, url):
+        try:
+            with open(self._path(url), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def set(self, url, entry):
+        path = self._path(url)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(path + '.tmp', path)
+
+
+class RedisBackend:
+    """All entries in one Redis hash keyed by URL, shared by every worker."""
+
+    def __init__(self, redis_url):
+        import redis
+        self.client = redis.Redis.from_url(redis_url)
+
+    def get(self, url):
+        value = self.client.hget(REDIS_KEY, url)
+        return json.loads(value) if value else None
+
+    def set(self, url, entry):
+        self.client.hset(REDIS_KEY, url, json.dumps(entry))
+
+
+class HttpCache:
+    """Conditional-request bookkeeping for scraper fetches.
+
+    request_headers() adds If-None-Match/If-Modified-Since for a URL and
+    is_unchanged() tells whether a response is a 304 or has the same body
+    hash as last time. New validators are only persisted by commit(), once
+    the page has actually been processed, so a failed write is retried on
+    the next run.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def request_headers(self, url):
+        entry = self.backend.get(url) or {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def is_unchanged(self, url, response):
+        if response.status_code == 304:
+            unchanged = True
+        else:
+            body_hash = hashlib.sha256(response.content).hexdigest()
+            entry = self.backend.get(url) or {}
+            unchanged = entry.get('body_hash') == body_hash
+            if not unchanged:
+                with self._lock:
+                    self._pending[url] = {
+                        'etag': response.headers.get('ETag'),
+                        'last_modified': response.headers.get('Last-Modified'),
+                        'body_hash': body_hash,
+                    }
+
+        with self._lock:
+            if unchanged:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return unchanged
+
+    def commit(self, url):
+        """Persists the validators of a processed response."""
+        self.store(url, self.take(url))
+
+    def take(self, url):
+        """Removes and returns the pending validators of a URL, for another process to store()."""
+        with self._lock:
+            return self._pending.pop(url, None)
+
+    def store(self, url, entry):
+        """Persists validators handed over by take()."""
+        if entry:
+            self.backend.set(url, entry)
+
+    def stats(self):
+        return f"{self.hits} hits, {self.misses} misses"
+
+
+def make_http_cache(backend):
+    """Builds an HttpCache for backend 'file' or 'redis'."""
+    if backend == 'redis':
+        redis_url = getattr(settings, 'SCRAPER_HTTP_CACHE_URL', settings.CELERY_BROKER_URL)
+        return HttpCache(RedisBackend(redis_url))
+    directory = getattr(settings, 'SCRAPER_HTTP_CACHE_DIR', os.path.join(settings.BASE_DIR, '.http_cache'))
+    return HttpCache(FileBackend(directory))
+
+
+def get_http_cache():
+    """Process-wide cache from SCRAPER_HTTP_CACHE, or None when caching is off."""
+    global _shared_cache
+    backend = getattr(settings, 'SCRAPER_HTTP_CACHE', None)
+    if not backend:
+        return None
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = make_http_cache(backend)
+        return _shared_cache
@@ -0,0 +1,128 @@
+import os
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from servers.rate_limit import get_rate_limiter
+
+# urllib3 only decodes brotli when one of the brotli packages is installed
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = 'gzip, deflate, br'
+    except ImportError:
+        ACCEPT_ENCODING = 'gzip, deflate'
+
+_shared_client = None
+_shared_client_pid = None
+_shared_client_lock = threading.Lock()
+
+
+class ConnectionStats:
+    """Requests sent versus TCP/TLS connections opened by one client."""
+
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    @property
+    def reused(self):
+        return max(0, self.requests - self.connections)
+
+    def __str__(self):
+        return f"{self.requests} requests over {self.connections} connections ({self.reused} reused)"
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools report every new connection to `stats`."""
+
+    def __init__(self, stats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        stats = self.stats
+
+        class CountingHTTPConnectionPool(HTTPConnectionPool):
+            def _new_conn(self):
+                stats.record_connection()
+                return super()._new_conn()
+
+        class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+            def _new_conn(self):
+                stats.record_connection()
+                return super()._new_conn()
+
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': CountingHTTPConnectionPool,
+            'https': CountingHTTPSConnectionPool,
+        }
+
+
+class HttpClient:
+    """Keep-alive HTTP client with one connection pool per host and default timeouts.
+
+    requests speaks HTTP/1.1 only, so connection reuse comes from keep-alive
+    pools rather than HTTP/2 multiplexing. Every request waits for the
+    host's rate limiter and reports the response status back to it.
+    """
+
+    def __init__(self, pool_maxsize=10, connect_timeout=5, read_timeout=20, rate_limiter=None):
+        self.timeout = (connect_timeout, read_timeout)
+        self.rate_limiter = rate_limiter
+        self.stats = ConnectionStats()
+        self.session = requests.Session()
+        self.session.headers['Accept-Encoding'] = ACCEPT_ENCODING
+        adapter = PooledAdapter(self.stats, pool_connections=10, pool_maxsize=pool_maxsize)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        host = urlsplit(url).netloc
+        if self.rate_limiter:
+            self.rate_limiter.acquire(host)
+        self.stats.record_request()
+        response = self.session.get(url, **kwargs)
+        if self.rate_limiter:
+            self.rate_limiter.feedback(host, response.status_code, response.headers.get('Retry-After'))
+        return response
+
+    def close(self):
+        self.session.close()
+
+
+def get_http_client():
+    """Process-wide client shared by every command and Celery task.
+
+    A new client is built after a fork so that worker processes never share
+    sockets with their parent.
+    """
+    global _shared_client, _shared_client_pid
+    with _shared_client_lock:
+        if _shared_client is None or _shared_client_pid != os.getpid():
+            _shared_client = HttpClient(
+                pool_maxsize=getattr(settings, 'SCRAPER_HTTP_POOL_SIZE', 10),
+                connect_timeout=getattr(settings, 'SCRAPER_HTTP_CONNECT_TIMEOUT', 5),
+                read_timeout=getattr(settings, 'SCRAPER_HTTP_READ_TIMEOUT', 20),
+                rate_limiter=get_rate_limiter()
+            )
+            _shared_client_pid = os.getpid()
+        return _shared_client
@@ -0,0 +1,239 @@
+import hashlib
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from servers.models import Server, ServerFingerprint, WipeEvent, WipeSchedule
+from servers.response_cache import bump_generation
+from servers.wipe_times import format_wipe_day, format_wipe_hour, next_occurrence, schedule_minute
+
+# Rows per INSERT statement, keeps each statement well under max_allowed_packet
+WRITE_BATCH_SIZE = 500
+
+# Sources report the same wipe a few seconds apart; a later time within this window is the same wipe
+EVENT_MIN_GAP = timedelta(hours=1)
+
+
+class IngestResult:
+    """Counts of what one ingest_servers call did with its batch."""
+
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.skipped = 0
+        self.schedules_added = 0
+        self.events_added = 0
+        self.changes = []  # (server_id, server_name, [what changed]) for every server that needs a write
+
+    def __str__(self):
+        return (
+            f"{self.inserted} inserted, {self.updated} updated, {self.skipped} skipped, "
+            f"{self.schedules_added} new wipe schedules, {self.events_added} wipe events"
+        )
+
+
+def _upsert_options(unique_fields, update_fields):
+    """bulk_create options for an upsert on the current database backend."""
+    options = {'update_conflicts': True, 'update_fields': update_fields}
+    # MySQL's ON DUPLICATE KEY UPDATE can't name a conflict target
+    if connection.features.supports_update_conflicts_with_target:
+        options['unique_fields'] = unique_fields
+    return options
+
+
+def _wiped_at(server):
+    """The wipe datetime of a scraped dict; Celery results carry it as an ISO string."""
+    wiped_at = server.get("wiped_at")
+    if isinstance(wiped_at, str):
+        return parse_datetime(wiped_at)
+    return wiped_at
+
+
+def fingerprint(server, wipe_minutes):
+    """Signed 64-bit hash of what a scrape saw for a server: name, group size and weekly slots."""
+    payload = "\x1f".join([
+        str(server["server_name"]),
+        str(server["max_group"]),
+        ",".join(str(minute) for minute in sorted(wipe_minutes)),
+    ])
+    return int.from_bytes(hashlib.blake2b(payload.encode('utf-8'), digest_size=8).digest(), 'big', signed=True)
+
+
+def forget_fingerprints(server_ids):
+    """Makes the next scrape of these servers go through the full diff, e.g. after an edit outside ingestion.
+
+    last_wiped_at is kept, so the wipe already logged isn't appended again.
+    """
+    ServerFingerprint.objects.filter(server_id__in=list(server_ids)).update(digest=None)
+
+
+def _slot_label(wipe_minute, now):
+    next_wipe = next_occurrence(wipe_minute, now)
+    return f"{format_wipe_day(next_wipe)} {format_wipe_hour(next_wipe)}"
+
+
+def _is_new_wipe(wiped_at, last_wiped_at):
+    return wiped_at is not None and (last_wiped_at is None or wiped_at > last_wiped_at + EVENT_MIN_GAP)
+
+
+def ingest_servers(servers_data, server_index=None, dry_run=False, source=None):
+    """Writes a batch of scraped server dicts using a fixed number of queries.
+
+    Each server's fingerprint is compared with the one stored by the last
+    scrape in one IN query; matching servers are skipped without further
+    reads. The rest are diffed in memory against their rows and written with
+    bulk upserts in one transaction, together with their new fingerprints.
+    A past wipe later than the last one logged for a server is appended
+    to WipeEvent, credited to the dict's "source" or else `source`; the
+    fingerprint row remembers it, so no event lookup is needed.
+
+    Inserted IDs are added to `server_index` when one is given. With
+    `dry_run` nothing is written and `changes` lists what would be.
+    """
+    result = IngestResult()
+    if not servers_data:
+        return result
+
+    now = timezone.now()
+
+    # Collapse the batch to one row per server plus every weekly slot seen for it
+    incoming = {}
+    incoming_schedules = {}
+    latest_wipes = {}  # server_id -> (latest wiped_at in the batch, its source)
+    for server in servers_data:
+        server_id = server["server_id"]
+        if server_id not in incoming:
+            incoming[server_id] = server
+            incoming_schedules[server_id] = {}
+        elif incoming[server_id]["max_group"] is None:
+            incoming[server_id] = server
+        wiped_at = _wiped_at(server)
+        if wiped_at is not None:
+            incoming_schedules[server_id].setdefault(schedule_minute(wiped_at), wiped_at)
+            # Announced future wipes (upcoming_wipes) are schedules, only past ones are events
+            if wiped_at <= now and (server_id not in latest_wipes or wiped_at > latest_wipes[server_id][0]):
+                latest_wipes[server_id] = (wiped_at, server.get("source") or source)
+
+    digests = {
+        server_id: fingerprint(server, incoming_schedules[server_id]) for server_id, server in incoming.items()
+    }
+    stored = {
+        server_id: (digest, last_wiped_at)
+        for server_id, digest, last_wiped_at in ServerFingerprint.objects.filter(
+            server_id__in=list(incoming)
+        ).values_list('server_id', 'digest', 'last_wiped_at')
+    }
+    changed = [
+        server_id for server_id, digest in digests.items()
+        if server_id not in stored
+        or stored[server_id][0] != digest
+        or _is_new_wipe(latest_wipes.get(server_id, (None,))[0], stored[server_id][1])
+    ]
+    result.skipped = len(incoming) - len(changed)
+    if not changed:
+        return result
+
+    existing_servers = Server.objects.in_bulk(changed)
+    existing_schedules = set(
+        WipeSchedule.objects.filter(server_id__in=changed).values_list('server_id', 'wipe_minute')
+    )
+
+    servers_to_write = []
+    schedules_to_write = []
+    events_to_write = []
+    last_wipes = {}
+    inserted_ids = []
+    for server_id in changed:
+        server = incoming[server_id]
+        last_wiped_at = stored.get(server_id, (None, None))[1]
+        wiped_at, wipe_source = latest_wipes.get(server_id, (None, None))
+        last_wipes[server_id] = last_wiped_at
+        new_events = []
+        if _is_new_wipe(wiped_at, last_wiped_at):
+            new_events.append(WipeEvent(server_id=server_id, wiped_at=wiped_at, source=wipe_source or ''))
+            last_wipes[server_id] = wiped_at
+        events_to_write.extend(new_events)
+
+        new_schedules = [
+            WipeSchedule(server_id=server_id, wipe_minute=wipe_minute, wiped_at=wiped_at)
+            for wipe_minute, wiped_at in incoming_schedules[server_id].items()
+            if (server_id, wipe_minute) not in existing_schedules
+        ]
+        schedules_to_write.extend(new_schedules)
+        details = [f"new slot {_slot_label(schedule.wipe_minute, now)}" for schedule in new_schedules]
+        details.extend(f"wiped at {event.wiped_at:%Y-%m-%d %H:%M} ({event.source})" for event in new_events)
+
+        current = existing_servers.get(server_id)
+        if current is None:
+            servers_to_write.append(Server(
+                server_id=server_id,
+                server_name=server["server_name"],
+                max_group=server["max_group"]
+            ))
+            inserted_ids.append(server_id)
+            result.inserted += 1
+            result.changes.append((server_id, server["server_name"], ["new server"] + details))
+            continue
+
+        # Never overwrite a known group size with an unknown one
+        max_group = server["max_group"] if server["max_group"] is not None else current.max_group
+        if current.server_name != server["server_name"]:
+            details.insert(0, f"name {current.server_name!r} -> {server['server_name']!r}")
+        if current.max_group != max_group:
+            details.insert(0, f"max_group {current.max_group} -> {max_group}")
+        if current.server_name != server["server_name"] or current.max_group != max_group:
+            servers_to_write.append(Server(
+                server_id=server_id,
+                server_name=server["server_name"],
+                max_group=max_group
+            ))
+            result.updated += 1
+        elif new_schedules or new_events:
+            result.updated += 1
+        else:
+            # Only the fingerprint is stale, e.g. the first scrape after it was introduced
+            result.skipped += 1
+        if details:
+            result.changes.append((server_id, server["server_name"], details))
+
+    result.schedules_added = len(schedules_to_write)
+    result.events_added = len(events_to_write)
+    if dry_run:
+        return result
+
+    fingerprints_to_write = [
+        ServerFingerprint(server_id=server_id, digest=digests[server_id], last_wiped_at=last_wipes[server_id])
+        for server_id in changed
+    ]
+
+    with transaction.atomic():
+        if servers_to_write:
+            Server.objects.bulk_create(
+                servers_to_write,
+                batch_size=WRITE_BATCH_SIZE,
+                **_upsert_options(['server_id'], ['server_name', 'max_group'])
+            )
+        if schedules_to_write:
+            WipeSchedule.objects.bulk_create(
+                schedules_to_write,
+                batch_size=WRITE_BATCH_SIZE,
+                ignore_conflicts=True
+            )
+        if events_to_write:
+            # Append-only: plain INSERTs, duplicates are already ruled out by last_wiped_at
+            WipeEvent.objects.bulk_create(events_to_write, batch_size=WRITE_BATCH_SIZE)
+        ServerFingerprint.objects.bulk_create(
+            fingerprints_to_write,
+            batch_size=WRITE_BATCH_SIZE,
+            **_upsert_options(['server'], ['digest', 'last_wiped_at'])
+        )
+        if servers_to_write or schedules_to_write:
+            # Cached API responses are retired only once the new rows are visible
+            transaction.on_commit(bump_generation)
+
+    if server_index is not None:
+        server_index.add_many(inserted_ids)
+
+    return result
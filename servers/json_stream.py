@@ -0,0 +1,74 @@
+import codecs
+import json
+import re
+
+_WHITESPACE_AND_COMMAS = re.compile(r'[\s,]*')
+
+
+class JsonArrayStream:
+    """Decodes the items of one top-level array of a JSON object while it downloads.
+
+    Iterating yields each element of `key` as soon as it is complete, so only
+    one item plus the undecoded tail of the current chunk are held in
+    memory. Once iteration finishes, `document` holds the rest of the
+    object (for example `links` and `meta`) with the array replaced by null.
+    """
+
+    def __init__(self, chunks, key='data'):
+        self.chunks = chunks
+        self.key = key
+        self.document = None
+
+    def _read(self, chunks, decoder):
+        for chunk in chunks:
+            text = decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+            if text:
+                return text
+        return None
+
+    def __iter__(self):
+        chunks = iter(self.chunks)
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        json_decoder = json.JSONDecoder()
+        marker = re.compile(r'"%s"\s*:\s*\[' % re.escape(self.key))
+        buffer = ''
+
+        # Everything before the array is kept to rebuild the surrounding document
+        while True:
+            match = marker.search(buffer)
+            if match:
+                prefix = buffer[:match.start()] + f'"{self.key}": null'
+                buffer = buffer[match.end():]
+                break
+            text = self._read(chunks, decoder)
+            if text is None:
+                self.document = json.loads(buffer)
+                return
+            buffer += text
+
+        while True:
+            position = _WHITESPACE_AND_COMMAS.match(buffer).end()
+            if position < len(buffer) and buffer[position] == ']':
+                buffer = buffer[position + 1:]
+                break
+            try:
+                item, end = json_decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                end = None
+            # An item that ends exactly at the buffer edge may be truncated, wait for more
+            if end is None or end >= len(buffer):
+                text = self._read(chunks, decoder)
+                if text is None:
+                    raise ValueError(f"Stream ended inside the {self.key!r} array")
+                buffer += text
+                continue
+            buffer = buffer[end:]
+            yield item
+
+        remaining = [buffer]
+        while True:
+            text = self._read(chunks, decoder)
+            if text is None:
+                break
+            remaining.append(text)
+        self.document = json.loads(prefix + ''.join(remaining))
@@ -0,0 +1,92 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Prefetch
+from rest_framework.renderers import JSONRenderer
+from servers.models import Server, WipeSchedule
+from servers.renderers import MessagePackRenderer, ORJSONRenderer
+from servers.rows import SERVER_FIELDS, attach_schedules, server_columns
+from servers.serializers import ServerSerializer
+import time
+
+
+class Command(BaseCommand):
+    help = 'Compares ServerSerializer with the values() read path and the orjson/msgpack renderers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Servers per run')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per variant; the fastest one is reported')
+        parser.add_argument(
+            '--seed',
+            action='store_true',
+            help='Insert synthetic servers when fewer than --rows exist (rolled back afterwards)'
+        )
+
+    def seed(self, missing):
+        """Adds `missing` synthetic servers with three schedules each."""
+        start = (Server.objects.aggregate(top=Max('server_id'))['top'] or 0) + 1
+        server_ids = range(start, start + missing)
+        Server.objects.bulk_create(
+            [Server(server_id=server_id, server_name=f"Benchmark server {server_id}", max_group=server_id % 4 or None)
+             for server_id in server_ids],
+            batch_size=1000
+        )
+        WipeSchedule.objects.bulk_create(
+            [WipeSchedule(server_id=server_id, wipe_minute=(server_id * 60 + offset) % 10080)
+             for server_id in server_ids for offset in (0, 2880, 5760)],
+            batch_size=1000
+        )
+
+    def serializer_path(self, rows, renderer):
+        schedules = WipeSchedule.objects.order_by('wipe_minute')
+        servers = Server.objects.order_by('server_id').prefetch_related(Prefetch('wipe_schedules', queryset=schedules))[:rows]
+        return renderer.render(ServerSerializer(servers, many=True).data)
+
+    def values_path(self, rows, renderer):
+        servers = list(Server.objects.order_by('server_id').values(*server_columns(SERVER_FIELDS))[:rows])
+        attach_schedules(servers, SERVER_FIELDS, WipeSchedule.objects.order_by('wipe_minute'))
+        return renderer.render(servers)
+
+    def measure(self, repeat, run):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            body = run()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, len(body)
+
+    def handle(self, *args, **kwargs):
+        rows = kwargs['rows']
+        repeat = max(1, kwargs['repeat'])
+
+        with transaction.atomic():
+            available = Server.objects.count()
+            if available < rows and kwargs['seed']:
+                self.stdout.write(self.style.NOTICE(f"Seeding {rows - available} synthetic servers..."))
+                self.seed(rows - available)
+            elif available < rows:
+                self.stdout.write(self.style.WARNING(f"Only {available} servers in the database, use --seed for {rows}"))
+                rows = available
+            if not rows:
+                return
+
+            variants = [
+                ('ServerSerializer + JSONRenderer', lambda: self.serializer_path(rows, JSONRenderer())),
+                ('values() + JSONRenderer', lambda: self.values_path(rows, JSONRenderer())),
+                ('values() + ORJSONRenderer', lambda: self.values_path(rows, ORJSONRenderer())),
+                ('values() + MessagePackRenderer', lambda: self.values_path(rows, MessagePackRenderer())),
+            ]
+            baseline = None
+            self.stdout.write(self.style.NOTICE(f"\n{rows} servers, best of {repeat} runs:"))
+            for name, run in variants:
+                seconds, size = self.measure(repeat, run)
+                baseline = baseline or seconds
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"{name:<34} {seconds * 1000:8.1f} ms  {rows / seconds:10.0f} rows/s  "
+                        f"{size / 1024:8.1f} KiB  {baseline / seconds:5.2f}x"
+                    )
+                )
+
+            # Seeded rows are never kept
+            transaction.set_rollback(True)
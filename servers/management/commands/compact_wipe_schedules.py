@@ -0,0 +1,151 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from servers.ingestion import forget_fingerprints
+from servers.models import Server, WipeEvent, WipeSchedule
+from servers.response_cache import bump_generation
+from servers.wipe_times import schedule_minute
+
+CHECKPOINT_KEY = 'compact_wipe_schedules:checkpoint'
+
+
+def is_minted(wiped_at):
+    """Whether a schedule's time came from the old datetime.now() fallback.
+
+    Those stored the run time down to the microsecond, while every source
+    reports wipes in whole seconds or milliseconds.
+    """
+    return wiped_at is not None and wiped_at.microsecond % 1000 != 0
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes the wipe schedules recorded from the scrape time instead of a real wipe time, '
+        'keeping any slot a logged wipe event confirms'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Servers examined per chunk; the checkpoint is saved after each one'
+        )
+        parser.add_argument(
+            '--delete-batch',
+            type=int,
+            default=1000,
+            help='Schedule rows removed per DELETE statement'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0.1,
+            help='Seconds to pause between chunks so other writers get the table'
+        )
+        parser.add_argument(
+            '--confirm-weeks',
+            type=int,
+            default=2,
+            help='Weeks with a logged wipe a server needs before its unconfirmed legacy schedules are deleted'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='List the schedules that would be deleted per server without deleting them or moving the checkpoint'
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Ignore the saved checkpoint and start from the lowest server ID'
+        )
+
+    def minted_schedules(self, server_ids, confirm_weeks):
+        """server_id -> IDs of its minted or legacy schedules whose slot no wipe event confirms.
+
+        Legacy schedules, converted by migration 0002 without a wiped_at,
+        keep no trace of how they were recorded. They only count for servers
+        with logged wipes in at least `confirm_weeks` different weeks, so each
+        of their real weekly slots has had the chance to be confirmed.
+        """
+        confirmed = set()
+        observed_weeks = {}
+        events = WipeEvent.objects.filter(server_id__in=server_ids).values_list('server_id', 'wiped_at')
+        for server_id, wiped_at in events:
+            confirmed.add((server_id, schedule_minute(wiped_at)))
+            observed_weeks.setdefault(server_id, set()).add(wiped_at.isocalendar()[:2])
+
+        minted = {}
+        schedules = WipeSchedule.objects.filter(server_id__in=server_ids).values_list(
+            'id', 'server_id', 'wipe_minute', 'wiped_at'
+        )
+        for schedule_id, server_id, wipe_minute, wiped_at in schedules:
+            if (server_id, wipe_minute) in confirmed:
+                continue
+            if wiped_at is None:
+                candidate = len(observed_weeks.get(server_id, ())) >= confirm_weeks
+            else:
+                candidate = is_minted(wiped_at)
+            if candidate:
+                minted.setdefault(server_id, []).append(schedule_id)
+        return minted
+
+    def delete_schedules(self, schedule_ids, batch_size):
+        """Deletes by primary key in short statements, each committed on its own."""
+        for start in range(0, len(schedule_ids), batch_size):
+            WipeSchedule.objects.filter(id__in=schedule_ids[start:start + batch_size]).delete()
+
+    def handle(self, *args, **kwargs):
+        chunk_size = kwargs['chunk_size']
+        dry_run = kwargs['dry_run']
+
+        last_server_id = 0 if kwargs['restart'] else cache.get(CHECKPOINT_KEY, 0)
+        if last_server_id:
+            self.stdout.write(self.style.NOTICE(f"Resuming after server {last_server_id}"))
+
+        servers_compacted = 0
+        schedules_deleted = 0
+        while True:
+            server_ids = list(
+                Server.objects.filter(server_id__gt=last_server_id)
+                .order_by('server_id')
+                .values_list('server_id', flat=True)[:chunk_size]
+            )
+            if not server_ids:
+                break
+
+            minted = self.minted_schedules(server_ids, kwargs['confirm_weeks'])
+            schedule_ids = [schedule_id for ids in minted.values() for schedule_id in ids]
+            if dry_run:
+                for server_id, ids in minted.items():
+                    self.stdout.write(f"Server {server_id}: {len(ids)} minted schedules")
+            elif schedule_ids:
+                self.delete_schedules(schedule_ids, kwargs['delete_batch'])
+                # Their next scrape must store the real slot again instead of matching the old fingerprint
+                forget_fingerprints(list(minted))
+            servers_compacted += len(minted)
+            schedules_deleted += len(schedule_ids)
+
+            last_server_id = server_ids[-1]
+            if not dry_run:
+                cache.set(CHECKPOINT_KEY, last_server_id, timeout=None)
+            self.stdout.write(
+                f"Up to server {last_server_id}: {servers_compacted} servers, {schedules_deleted} schedules"
+            )
+            if kwargs['sleep']:
+                time.sleep(kwargs['sleep'])
+
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(
+                f"Dry run: would delete {schedules_deleted} schedules of {servers_compacted} servers"
+            ))
+            return
+
+        cache.delete(CHECKPOINT_KEY)
+        if schedules_deleted:
+            bump_generation()
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {schedules_deleted} minted schedules of {servers_compacted} servers"
+        ))
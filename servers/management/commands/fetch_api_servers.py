@@ -1,13 +1,52 @@
 from django.core.management.base import BaseCommand
-import requests
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from django.db import connections
 import time
 from datetime import datetime
-import pytz
-from servers.models import Server, WipeSchedule
+from servers.http_client import get_http_client
+from servers.json_stream import JsonArrayStream
+from servers.ingestion import WRITE_BATCH_SIZE, ingest_servers
+from servers.pipeline import BatchWriter, Pipeline
+from servers.server_index import ServerIdIndex
 import json
 import os
 from django.conf import settings
 
+API_URL = 'https://api.battlemetrics.com/servers'
+PAGE_SIZE = 100
+STREAM_CHUNK_SIZE = 16 * 1024
+
+# Player-count band edges for --shards: [0, 0], [1, 4], [5, 19], ... [200, inf)
+DEFAULT_SHARD_BOUNDS = [0, 1, 5, 20, 50, 100, 200]
+
+
+def player_count_shards(bounds, base_params):
+    """Splits the server list into independent (label, query params) partitions by player count."""
+    shards = []
+    for position, low in enumerate(bounds):
+        params = dict(base_params, **{'filter[players][min]': low})
+        if position + 1 < len(bounds):
+            high = bounds[position + 1] - 1
+            params['filter[players][max]'] = high
+            label = f"players {low}-{high}"
+        else:
+            label = f"players {low}+"
+        shards.append((label, params))
+    return shards
+
+
+def crawl_shard(label, params, max_pages=None):
+    """Crawls one shard without touching the database. Returns (label, servers, pages, seconds)."""
+    command = Command()
+    command.server_index = ServerIdIndex()  # is_existing is recomputed after the merge
+    started = time.monotonic()
+    servers_data = []
+    pages = 0
+    for pages, page_servers in command.iter_pages(params, max_pages):
+        servers_data.extend(page_servers)
+    return label, servers_data, pages, time.monotonic() - started
+
+
 class Command(BaseCommand):
     help = 'Fetches Rust servers data from various APIs and saves to database'
 
@@ -20,42 +59,72 @@ class Command(BaseCommand):
             'Accept': 'application/json'
         }
 
-    def format_wipe_time(self, dt):
-        """Convert datetime to EST hour format."""
-        est = pytz.timezone('US/Eastern')
-        dt_est = dt.astimezone(est)
-        hour = dt_est.strftime('%I%p').lstrip('0').lower()  # Convert to 1pm format
-        return f"{hour} est"
-
-    def get_day_name(self, dt):
-        """Convert datetime to day name."""
-        return dt.strftime('%A')  # Returns full day name (Monday, Tuesday, etc.)
-
-    def fetch_battlemetrics_servers(self, page=1):
-        """Fetch Rust servers from BattleMetrics API."""
-        url = 'https://api.battlemetrics.com/servers'
-        params = {
+    def get_query_params(self):
+        """Query for the first page; later pages follow the links.next cursor."""
+        return {
             'filter[game]': 'rust',
             'filter[status]': 'online',
-            'page[size]': 100,
-            'page[number]': page,
-            'sort': '-players'  # Sort by most players
+            'page[size]': PAGE_SIZE,
+            'sort': '-players',  # Sort by most players
+            'fields[server]': 'name,details'  # Only the attributes extract_server_info reads
         }
 
+    def fetch_battlemetrics_servers(self, url=API_URL, params=None):
+        """Fetch one page of Rust servers from the BattleMetrics API.
+
+        The body is decoded as it streams in. Returns (server dicts, URL of the
+        next page or None), or None when the request failed.
+        """
+        try:
+            response = get_http_client().get(url, headers=self.headers, params=params, stream=True)
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(f"Error fetching from BattleMetrics: {e}")
+            )
+            return None
+
         try:
-            response = requests.get(url, headers=self.headers, params=params)
-            if response.status_code == 200:
-                return response.json()
-            else:
+            if response.status_code != 200:
                 self.stdout.write(
                     self.style.ERROR(f"BattleMetrics API error: {response.status_code}")
                 )
                 return None
+
+            servers = JsonArrayStream(response.iter_content(chunk_size=STREAM_CHUNK_SIZE), 'data')
+            servers_data = [info for info in map(self.extract_server_info, servers) if info]
+            next_url = (servers.document.get('links') or {}).get('next')
+            return servers_data, next_url
         except Exception as e:
             self.stdout.write(
-                self.style.ERROR(f"Error fetching from BattleMetrics: {e}")
+                self.style.ERROR(f"Error reading BattleMetrics response: {e}")
             )
             return None
+        finally:
+            response.close()
+
+    def iter_pages(self, params=None, max_pages=None):
+        """Follows links.next cursors, yielding (page number, server dicts).
+
+        The next page is downloaded in the background while the caller
+        processes the current one.
+        """
+        # extract_server_info runs on the prefetch thread, keep its DB access on this one
+        self.get_server_index()
+
+        with ThreadPoolExecutor(max_workers=1) as prefetcher:
+            pending = prefetcher.submit(self.fetch_battlemetrics_servers, API_URL, params or self.get_query_params())
+            page = 0
+            while pending is not None:
+                result = pending.result()
+                if result is None:
+                    return
+                servers_data, next_url = result
+                page += 1
+
+                pending = None
+                if next_url and (max_pages is None or page < max_pages):
+                    pending = prefetcher.submit(self.fetch_battlemetrics_servers, next_url)
+                yield page, servers_data
 
     def extract_server_info(self, server_data):
         """Extract relevant server information from API response."""
@@ -77,20 +146,19 @@ class Command(BaseCommand):
 
             # Get wipe info from server details
             details = attributes.get('details', {})
-            wipe_info = details.get('rust_last_wipe')
-            
-            if wipe_info:
-                wipe_dt = datetime.fromisoformat(wipe_info.replace('Z', '+00:00'))
-            else:
-                wipe_dt = datetime.now(pytz.UTC)
+            wipe_info = details.get('rust_last_wipe') or details.get('rust_born')
+
+            # No wipe time means no schedule; the current time would record a slot that never happened
+            wipe_dt = datetime.fromisoformat(wipe_info.replace('Z', '+00:00')) if wipe_info else None
 
+            # JSON:API keeps the ID next to attributes, which only hold the requested fields
+            server_id = int(server_data['id'])
             return {
-                "server_id": int(attributes['id']),
+                "server_id": server_id,
                 "server_name": server_name,
-                "wipe_time": self.format_wipe_time(wipe_dt),
-                "wipe_day": self.get_day_name(wipe_dt),
+                "wiped_at": wipe_dt,
                 "max_group": max_group,
-                "is_existing": False  # Will be updated when checking database
+                "is_existing": server_id in self.get_server_index()
             }
         except Exception as e:
             self.stdout.write(
@@ -98,66 +166,21 @@ class Command(BaseCommand):
             )
             return None
 
+    def get_server_index(self):
+        """Run-scoped index of known server IDs, loaded on first use."""
+        if getattr(self, 'server_index', None) is None:
+            self.server_index = ServerIdIndex.load()
+        return self.server_index
+
     def update_database(self, servers_data):
-        """Updates the database with new servers and additional wipe schedules."""
-        for server in servers_data:
-            try:
-                # Check if server exists
-                existing_server = Server.objects.filter(server_id=server["server_id"]).first()
-                
-                if existing_server:
-                    server["is_existing"] = True
-                    # Check if this wipe schedule already exists
-                    existing_schedule = WipeSchedule.objects.filter(
-                        server=existing_server,
-                        day_name=server["wipe_day"],
-                        wipe_hour=server["wipe_time"]
-                    ).first()
-
-                    if not existing_schedule:
-                        # Add new wipe schedule for existing server
-                        WipeSchedule.objects.create(
-                            server=existing_server,
-                            day_name=server["wipe_day"],
-                            wipe_hour=server["wipe_time"]
-                        )
-                        self.stdout.write(
-                            self.style.SUCCESS(
-                                f"Added new wipe schedule for existing server: {server['server_name']} - "
-                                f"{server['wipe_day']} at {server['wipe_time']}"
-                            )
-                        )
-                    else:
-                        self.stdout.write(
-                            self.style.WARNING(
-                                f"Skipping duplicate wipe schedule for server: {server['server_name']} - "
-                                f"{server['wipe_day']} at {server['wipe_time']}"
-                            )
-                        )
-                else:
-                    # Create new server
-                    new_server = Server.objects.create(
-                        server_id=server["server_id"],
-                        server_name=server["server_name"],
-                        max_group=server["max_group"]
-                    )
-
-                    # Create first wipe schedule
-                    WipeSchedule.objects.create(
-                        server=new_server,
-                        day_name=server["wipe_day"],
-                        wipe_hour=server["wipe_time"]
-                    )
-                    self.stdout.write(
-                        self.style.SUCCESS(
-                            f"Added new server with wipe schedule: {server['server_name']} - "
-                            f"{server['wipe_day']} at {server['wipe_time']}"
-                        )
-                    )
-            except Exception as e:
-                self.stdout.write(
-                    self.style.ERROR(f"Error updating database for server {server['server_name']}: {e}")
-                )
+        """Writes a batch of servers and their wipe schedules to the database."""
+        try:
+            result = ingest_servers(servers_data, self.get_server_index(), source='fetch_api_servers')
+            self.stdout.write(self.style.SUCCESS(f"Database updated: {result}"))
+            return result
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"Error updating database: {e}"))
+            return None
 
     def save_existing_servers_to_json(self, existing_servers):
         """Save existing server names to a JSON file."""
@@ -182,6 +205,114 @@ class Command(BaseCommand):
                 self.style.ERROR(f"Error saving server names to JSON: {e}")
             )
 
+    def merge_shards(self, shard_results):
+        """Deduplicates shard results by server_id (a server can move between bands mid-crawl)."""
+        existing_server_ids = self.get_server_index()
+        merged = {}
+        for _, servers_data, _, _ in shard_results:
+            for server in servers_data:
+                if server["server_id"] not in merged:
+                    server["is_existing"] = server["server_id"] in existing_server_ids
+                    merged[server["server_id"]] = server
+        return list(merged.values())
+
+    def crawl_sharded(self, workers, bounds, max_pages):
+        """Runs every shard in a process pool and returns the merged server dicts."""
+        shards = player_count_shards(bounds, self.get_query_params())
+        self.stdout.write(self.style.NOTICE(f"Crawling {len(shards)} shards in {workers} processes..."))
+
+        # Forked workers must not inherit the parent's database connections
+        connections.close_all()
+        shard_results = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(crawl_shard, label, params, max_pages) for label, params in shards]
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f"Shard failed: {e}"))
+                    continue
+                label, servers_data, pages, seconds = result
+                self.stdout.write(
+                    self.style.NOTICE(f"Shard {label}: {len(servers_data)} servers, {pages} pages in {seconds:.1f}s")
+                )
+                shard_results.append(result)
+
+        if shard_results:
+            timings = [seconds for _, _, _, seconds in shard_results]
+            mean = sum(timings) / len(timings)
+            skew = max(timings) / mean if mean else 1.0
+            self.stdout.write(
+                self.style.NOTICE(
+                    f"Shard timing: min {min(timings):.1f}s, mean {mean:.1f}s, max {max(timings):.1f}s "
+                    f"(skew {skew:.2f}x)"
+                )
+            )
+        return self.merge_shards(shard_results)
+
+    def collect_stage(self, item):
+        """Stops at the first empty page and records which servers were already known."""
+        page, servers_data = item
+        self.stdout.write(self.style.NOTICE(f"\nFetched page {page} from BattleMetrics API"))
+        if not servers_data:
+            self.stdout.write(self.style.WARNING(f"No servers found on page {page}"))
+            self.pipeline.stop()
+            return None
+
+        for server in servers_data:
+            if server["is_existing"]:
+                self.existing_servers.append({
+                    "name": server["server_name"],
+                    "id": server["server_id"]
+                })
+        return [servers_data]
+
+    def write_pages(self, pages):
+        """Writer stage: stores several API pages in one database batch."""
+        servers_data = [server for page_servers in pages for server in page_servers]
+        self.update_database(servers_data)
+        self.servers_written += len(servers_data)
+        self.stdout.write(self.style.SUCCESS(f"Processed {len(servers_data)} servers from {len(pages)} pages"))
+
+    def crawl_pipelined(self, max_pages):
+        """Downloads and decodes pages on one thread while batches are written on another."""
+        self.servers_written = 0
+        writer = BatchWriter(self.write_pages, WRITE_BATCH_SIZE)
+        self.pipeline = (
+            Pipeline(queue_size=2)
+            .source('fetch', self.iter_pages(max_pages=max_pages))
+            .stage('collect', self.collect_stage)
+            .stage('write', writer.add, flush=writer.flush)
+        )
+
+        stats = self.pipeline.run()
+        self.stdout.write(self.style.NOTICE("\nPipeline throughput:"))
+        for stage_stats in stats:
+            self.stdout.write(self.style.NOTICE(f"  {stage_stats}"))
+        for stage, error in self.pipeline.errors:
+            self.stdout.write(self.style.ERROR(f"Pipeline stage {stage} failed: {error}"))
+        return self.servers_written
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-pages',
+            type=int,
+            default=None,
+            help='Stop after this many API pages (default: follow cursors to the end of the list)'
+        )
+        parser.add_argument(
+            '--shards',
+            type=int,
+            default=0,
+            help='Crawl player-count partitions in this many worker processes and write once (0 = single crawl)'
+        )
+        parser.add_argument(
+            '--shard-bounds',
+            type=lambda value: [int(bound) for bound in value.split(',')],
+            default=DEFAULT_SHARD_BOUNDS,
+            help='Comma-separated player-count band edges used by --shards'
+        )
+
     def handle(self, *args, **kwargs):
         """Main function to run the API fetching process."""
         if not self.battlemetrics_api_key:
@@ -192,54 +323,25 @@ class Command(BaseCommand):
 
         self.stdout.write(self.style.NOTICE("Starting API server fetch process..."))
         
-        existing_servers = []
-        total_servers_processed = 0
-        page = 1
-        max_pages = 10  # Adjust this based on your needs
-
-        while page <= max_pages:
-            self.stdout.write(self.style.NOTICE(f"\nFetching page {page} from BattleMetrics API..."))
-            
-            response_data = self.fetch_battlemetrics_servers(page)
-            if not response_data:
-                break
-
-            servers_data = []
-            for server in response_data.get('data', []):
-                server_info = self.extract_server_info(server)
-                if server_info:
-                    servers_data.append(server_info)
-
-            if servers_data:
-                # Track existing servers
-                for server in servers_data:
-                    if server["is_existing"]:
-                        existing_servers.append({
-                            "name": server["server_name"],
-                            "id": server["server_id"]
-                        })
-                
-                self.update_database(servers_data)
-                total_servers_processed += len(servers_data)
-                self.stdout.write(
-                    self.style.SUCCESS(f"Processed {len(servers_data)} servers from page {page}")
-                )
-            else:
-                self.stdout.write(self.style.WARNING(f"No servers found on page {page}"))
-                break
-
-            # Check if we've reached the last page
-            if len(response_data.get('data', [])) < 100:
-                break
+        self.existing_servers = []
 
-            page += 1
-            time.sleep(2)  # Rate limiting
+        if kwargs.get('shards'):
+            servers_data = self.crawl_sharded(kwargs['shards'], kwargs['shard_bounds'], kwargs.get('max_pages'))
+            self.existing_servers = [
+                {"name": server["server_name"], "id": server["server_id"]}
+                for server in servers_data if server["is_existing"]
+            ]
+            self.update_database(servers_data)
+            total_servers_processed = len(servers_data)
+        else:
+            total_servers_processed = self.crawl_pipelined(kwargs.get('max_pages'))
 
         # Save existing servers to JSON file
-        self.save_existing_servers_to_json(existing_servers)
+        self.save_existing_servers_to_json(self.existing_servers)
+        self.stdout.write(self.style.NOTICE(f"HTTP connections: {get_http_client().stats}"))
 
         self.stdout.write(
             self.style.SUCCESS(
                 f"\nAPI fetch completed. Total servers processed: {total_servers_processed}"
             )
-        ) 
\ No newline at end of file
+        )
@@ -1,17 +1,48 @@
 from django.core.management.base import BaseCommand
-from bs4 import BeautifulSoup
+from asgiref.sync import sync_to_async
+import asyncio
 import requests
 import random
-import time
-from django.utils import timezone
-from datetime import datetime
-from servers.models import Server, WipeSchedule
-import pytz  # Add this import at the top
+from servers.http_client import get_http_client
+from servers.http_cache import NOT_MODIFIED, get_http_cache, make_http_cache
+from servers.extraction import extract_just_wiped, max_group_from_name, stream_just_wiped
+from servers.ingestion import WRITE_BATCH_SIZE, ingest_servers
+from servers.parse_pool import ParsePool
+from servers.pipeline import BatchWriter, Pipeline
+from servers.server_index import ServerIdIndex
 import json
 import os
+from urllib.parse import urlsplit
+
+STREAM_CHUNK_SIZE = 16 * 1024
 
 class Command(BaseCommand):
     help = 'Scrapes recently wiped servers from Just-Wiped and saves new servers to the database'
+    max_pages = 11
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=0,
+            help='Fetch all listing pages concurrently with at most N requests per host (0 = sequential)'
+        )
+        parser.add_argument(
+            '--http-cache',
+            choices=['file', 'redis'],
+            help='Revalidate pages with ETag/Last-Modified and skip the ones that did not change'
+        )
+        parser.add_argument(
+            '--parse-workers',
+            type=int,
+            default=0,
+            help='Parse pages in N worker processes instead of the scraping process (0 = in-process)'
+        )
+        parser.add_argument(
+            '--stream',
+            action='store_true',
+            help='Parse pages while they download and pass each server on as soon as its card is read'
+        )
 
     def get_urls(self):
         """List of URLs to scrape."""
@@ -26,34 +57,20 @@ class Command(BaseCommand):
         """Generate URL for specific page number."""
         return f"https://just-wiped.net/rust_servers?max_max_group=1&min_max_group=1&min_rating=80&page={page}&region=any"
 
-    def has_servers(self, html):
-        """Check if the page has any servers listed."""
-        if not html:
+    def has_servers(self, page):
+        """Check if an extracted page has any servers listed."""
+        if not page:
             return False
-        soup = BeautifulSoup(html, "html.parser")
-        server_links = soup.find_all('a', title="Open the server details page")
-        count = len(server_links)
-        self.stdout.write(self.style.NOTICE(f"Found {count} servers on this page"))
-        return count > 0
+        self.stdout.write(self.style.NOTICE(f"Found {len(page.records)} servers on this page"))
+        return page.has_servers
 
-    def fetch_data(self, url):
-        """Fetches page content while bypassing cache issues."""
-        # Check if URL already has parameters
-        cache_param = f"nocache={random.randint(1, 1000000)}"
-        if '?' in url:
-            url_with_cache = f"{url}&{cache_param}"
-        else:
-            url_with_cache = f"{url}?{cache_param}"
-        
+    def prepare_request(self, url):
+        """Returns the URL and headers to send, either bypassing caches or revalidating through the HTTP cache."""
+        http_cache = getattr(self, 'http_cache', None)
         headers = {
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
             "Accept-Language": "en-US,en;q=0.5",
-            "Accept-Encoding": "gzip, deflate, br",
-            "Connection": "keep-alive",
-            "Cache-Control": "no-cache, no-store, must-revalidate",
-            "Pragma": "no-cache",
-            "Expires": "0",
             "Referer": "https://just-wiped.net/",
             "Sec-Fetch-Dest": "document",
             "Sec-Fetch-Mode": "navigate",
@@ -61,188 +78,138 @@ class Command(BaseCommand):
             "Sec-Fetch-User": "?1"
         }
 
-        session = requests.Session()
-        session.headers.update(headers)
+        if http_cache:
+            # Ask the server whether the page changed instead of busting caches
+            url_with_cache = url
+            headers.update(http_cache.request_headers(url))
+        else:
+            # Check if URL already has parameters
+            cache_param = f"nocache={random.randint(1, 1000000)}"
+            if '?' in url:
+                url_with_cache = f"{url}&{cache_param}"
+            else:
+                url_with_cache = f"{url}?{cache_param}"
+            headers.update({
+                "Cache-Control": "no-cache, no-store, must-revalidate",
+                "Pragma": "no-cache",
+                "Expires": "0",
+            })
+        return url_with_cache, headers
+
+    def fetch_data(self, url):
+        """Fetches page content, either bypassing caches or revalidating through the HTTP cache.
+
+        Returns NOT_MODIFIED when the HTTP cache says the page is unchanged.
+        """
+        http_cache = getattr(self, 'http_cache', None)
+        url_with_cache, headers = self.prepare_request(url)
+
+        client = get_http_client()
 
         max_retries = 3
         for attempt in range(max_retries):
             try:
-                time.sleep(random.uniform(1, 3))
-                response = session.get(url_with_cache, timeout=10)
+                response = client.get(url_with_cache, headers=headers)
+                if http_cache and response.status_code in (200, 304) and http_cache.is_unchanged(url, response):
+                    self.stdout.write(self.style.NOTICE(f"Unchanged since last run: {url}"))
+                    return NOT_MODIFIED
                 if response.status_code == 200:
                     return response.text
                 else:
+                    # The shared rate limiter backs off on 429/503 before the next attempt
                     self.stdout.write(self.style.WARNING(f"Attempt {attempt + 1} failed for {url}, status code: {response.status_code}"))
-                    time.sleep(random.uniform(2, 5))
             except requests.RequestException as e:
                 self.stdout.write(self.style.WARNING(f"Attempt {attempt + 1} failed for {url}: {e}"))
-                if attempt < max_retries - 1:
-                    time.sleep(random.uniform(2, 5))
         
         self.stdout.write(self.style.ERROR(f"All fetch attempts failed for {url}"))
         return None
 
-    def format_wipe_time(self, dt):
-        """Convert datetime to EST hour format."""
-        est = pytz.timezone('US/Eastern')
-        dt_est = dt.astimezone(est)
-        hour = dt_est.strftime('%I%p').lstrip('0').lower()  # Convert to 1pm format
-        return f"{hour} est"
+    def stream_page(self, url):
+        """Streams one listing page, yielding ServerRecords as each card is parsed.
 
-    def get_day_name(self, dt):
-        """Convert datetime to day name."""
-        return dt.strftime('%A')  # Returns full day name (Monday, Tuesday, etc.)
+        Failed requests are retried until the body starts arriving; a
+        connection lost mid-body ends the page with the records read so far.
+        """
+        url_with_cache, headers = self.prepare_request(url)
+        client = get_http_client()
+
+        max_retries = 3
+        for attempt in range(max_retries):
+            try:
+                response = client.get(url_with_cache, headers=headers, stream=True)
+            except requests.RequestException as e:
+                self.stdout.write(self.style.WARNING(f"Attempt {attempt + 1} failed for {url}: {e}"))
+                continue
+            if response.status_code != 200:
+                self.stdout.write(self.style.WARNING(f"Attempt {attempt + 1} failed for {url}, status code: {response.status_code}"))
+                response.close()
+                continue
+
+            try:
+                yield from stream_just_wiped(response.iter_content(chunk_size=STREAM_CHUNK_SIZE))
+            except requests.RequestException as e:
+                self.stdout.write(self.style.ERROR(f"Stream interrupted for {url}: {e}"))
+            finally:
+                response.close()
+            return
+
+        self.stdout.write(self.style.ERROR(f"All fetch attempts failed for {url}"))
+
+    def extract_page(self, html):
+        """Extracts the server cards of a page, in the parse pool when one is running."""
+        parse_pool = getattr(self, 'parse_pool', None)
+        if parse_pool:
+            return parse_pool.extract('just_wiped', html)
+        return extract_just_wiped(html)
 
     def parse_html(self, html):
         """Parses the fetched HTML and extracts server data."""
-        soup = BeautifulSoup(html, "html.parser")
-        server_links = soup.find_all('a', title="Open the server details page")
+        return self.build_servers_data(self.extract_page(html).records)
+
+    def build_servers_data(self, records):
+        """Turns extracted server records into the dicts written to the database."""
         servers_data = []
 
-        # Get all existing server IDs from database for faster lookup
-        existing_server_ids = set(Server.objects.values_list('server_id', flat=True))
+        # Known server IDs are loaded once per run, not once per page
+        existing_server_ids = self.get_server_index()
 
-        for link in server_links:
-            try:
-                server_id = int(link['href'].split('/')[-1])
-                server_container = link.find_parent('div', class_='server')
-                
-                # Get server rating
-                rating = 0
-                if server_container:
-                    rating_div = server_container.find('div', class_='sinfo i-rating')
-                    if rating_div:
-                        rating_value = rating_div.find('div', class_='value')
-                        if rating_value:
-                            rating_text = rating_value.text.strip().replace('%', '')
-                            if rating_text.isdigit():
-                                rating = int(rating_text)
-
-                # Only process servers with 60% or higher rating
-                if rating >= 60:
-                    server_name = link.text.strip()
-                    max_group = None
-                    
-                    # Find max group value
-                    if server_container:
-                        max_group_div = server_container.find('div', class_='sinfo i-max-group')
-                        if max_group_div:
-                            max_group_value = max_group_div.find('div', class_='value')
-                            if max_group_value and max_group_value.text.strip().isdigit():
-                                max_group = int(max_group_value.text.strip())
-
-                    # Modified time handling
-                    timeago = link.find_next('time', class_='timeago')
-                    if timeago and 'datetime' in timeago.attrs:
-                        full_time = datetime.fromisoformat(timeago['datetime'].replace('Z', '+00:00'))
-                        wipe_time = self.format_wipe_time(full_time)
-                        wipe_day = self.get_day_name(full_time)  # Get the day name
-                    else:
-                        current_time = timezone.now()
-                        wipe_time = self.format_wipe_time(current_time)
-                        wipe_day = self.get_day_name(current_time)
-
-                    # Get correct max_group based on server name, prioritizing larger groups
-                    name_lower = server_name.lower()
-                    if 'quad' in name_lower:
-                        max_group = 4
-                    elif 'trio' in name_lower:
-                        max_group = 3
-                    elif 'duo' in name_lower and 'trio' not in name_lower:
-                        max_group = 2
-                    elif 'solo' in name_lower and 'duo' not in name_lower and 'trio' not in name_lower:
-                        max_group = 1
-
-                    # Check if this is a new server or an existing one
-                    is_existing = server_id in existing_server_ids
-
-                    servers_data.append({
-                        "server_id": server_id,
-                        "server_name": server_name,
-                        "wipe_time": wipe_time,
-                        "max_group": max_group,
-                        "wipe_day": wipe_day,
-                        "is_existing": is_existing  # Add flag to indicate if server exists
-                    })
-                    
-                else:
-                    self.stdout.write(
-                        self.style.WARNING(f"Skipping low-rated server: {link.text.strip()} (Rating: {rating}%)")
-                    )
+        for record in records:
+            # Only process servers with 60% or higher rating
+            if record.rating < 60:
+                self.stdout.write(
+                    self.style.WARNING(f"Skipping low-rated server: {record.server_name} (Rating: {record.rating}%)")
+                )
+                continue
 
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f"Error parsing server: {e}"))
+            servers_data.append({
+                "server_id": record.server_id,
+                "server_name": record.server_name,
+                "wiped_at": record.wipe_dt,  # None when the card had no timestamp
+                "max_group": record.max_group,
+                "is_existing": record.server_id in existing_server_ids  # Add flag to indicate if server exists
+            })
 
         return servers_data
 
     def get_max_group_from_name(self, server_name):
         """Determine max group size from server name, prioritizing larger groups."""
-        name_lower = server_name.lower()
-        # Check in order from largest to smallest group size
-        if 'quad' in name_lower:
-            return 4
-        elif 'trio' in name_lower:
-            return 3
-        elif 'duo' in name_lower and 'trio' not in name_lower:  # Only duo if not trio
-            return 2
-        elif 'solo' in name_lower and 'duo' not in name_lower and 'trio' not in name_lower:  # Only solo if not duo/trio
-            return 1
-        return None
+        return max_group_from_name(server_name)
 
-    def update_database(self, servers_data):
-        """Updates the database with new servers and additional wipe schedules."""
-        for server in servers_data:
-            if server["is_existing"]:
-                # Get existing server
-                existing_server = Server.objects.get(server_id=server["server_id"])
-                
-                # Check if this wipe schedule already exists
-                existing_schedule = WipeSchedule.objects.filter(
-                    server=existing_server,
-                    day_name=server["wipe_day"],
-                    wipe_hour=server["wipe_time"]
-                ).first()
-
-                if not existing_schedule:
-                    # Add new wipe schedule for existing server
-                    WipeSchedule.objects.create(
-                        server=existing_server,
-                        day_name=server["wipe_day"],
-                        wipe_hour=server["wipe_time"]
-                    )
-                    self.stdout.write(
-                        self.style.SUCCESS(
-                            f"Added new wipe schedule for existing server: {server['server_name']} - "
-                            f"{server['wipe_day']} at {server['wipe_time']}"
-                        )
-                    )
-                else:
-                    self.stdout.write(
-                        self.style.WARNING(
-                            f"Skipping duplicate wipe schedule for server: {server['server_name']} - "
-                            f"{server['wipe_day']} at {server['wipe_time']}"
-                        )
-                    )
-            else:
-                # Create new server
-                new_server = Server.objects.create(
-                    server_id=server["server_id"],
-                    server_name=server["server_name"],
-                    max_group=server["max_group"]
-                )
+    def get_server_index(self):
+        """Run-scoped index of known server IDs, loaded on first use."""
+        if getattr(self, 'server_index', None) is None:
+            self.server_index = ServerIdIndex.load()
+        return self.server_index
 
-                # Create first wipe schedule
-                WipeSchedule.objects.create(
-                    server=new_server,
-                    day_name=server["wipe_day"],
-                    wipe_hour=server["wipe_time"]
-                )
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f"Added new server with wipe schedule: {server['server_name']} - "
-                        f"{server['wipe_day']} at {server['wipe_time']}"
-                    )
-                )
+    def update_database(self, servers_data):
+        """Writes a batch of servers and their wipe schedules to the database."""
+        try:
+            result = ingest_servers(servers_data, self.get_server_index(), source='recent_wipes')
+            self.stdout.write(self.style.SUCCESS(f"Database updated: {result}"))
+            return result
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"Error updating database: {e}"))
+            return None
 
     def save_existing_servers_to_json(self, existing_servers):
         """Save existing server names to a JSON file."""
@@ -267,6 +234,181 @@ class Command(BaseCommand):
                 self.style.ERROR(f"Error saving server names to JSON: {e}")
             )
 
+    def process_page(self, url, html, existing_servers, page=None):
+        """Parses one fetched page and writes its servers, returning how many were processed."""
+        if html is NOT_MODIFIED:
+            self.stdout.write(self.style.NOTICE(f"Skipping unchanged page {url}"))
+            return 0
+        if not html:
+            self.stdout.write(self.style.ERROR(f"Failed to retrieve content from {url}"))
+            return 0
+
+        page = page or self.extract_page(html)
+        servers_data = self.build_servers_data(page.records)
+        if not servers_data:
+            self.stdout.write(self.style.WARNING(f"No servers found at {url}"))
+            self.commit_http_cache(url)
+            return 0
+
+        # Track existing servers during parsing
+        for server in servers_data:
+            if server["is_existing"]:
+                existing_servers.append({
+                    "name": server["server_name"],
+                    "id": server["server_id"]
+                })
+
+        if self.update_database(servers_data):
+            self.commit_http_cache(url)
+        self.stdout.write(
+            self.style.SUCCESS(f"Processed {len(servers_data)} servers from {url}")
+        )
+        return len(servers_data)
+
+    def commit_http_cache(self, url):
+        """Remembers a processed page so an unchanged copy is skipped next run."""
+        if getattr(self, 'http_cache', None):
+            self.http_cache.commit(url)
+
+    def iter_pages(self):
+        """Source stage: the main listings, then the paginated listing until a page comes back empty."""
+        for url in self.get_urls():
+            yield url, None
+        for page in range(1, self.max_pages + 1):
+            yield self.get_paginated_url(page), page
+
+    def fetch_stage(self, item):
+        url, page = item
+        if page and self.pipeline.stopped:
+            return None  # Pagination already ended on an earlier page
+        self.stdout.write(self.style.NOTICE(f"\nProcessing URL: {url}"))
+        html = self.fetch_data(url)
+        if not html:
+            self.stdout.write(self.style.ERROR(f"Failed to retrieve content from {url}"))
+            if page:
+                self.pipeline.stop()
+            return None
+        return [(url, page, html)]
+
+    def extract_stage(self, item):
+        url, page, html = item
+        if html is NOT_MODIFIED:
+            # An unchanged paginated page still has servers, so pagination carries on
+            self.stdout.write(self.style.NOTICE(f"Skipping unchanged page {url}"))
+            return None
+        return [(url, page, self.extract_page(html))]
+
+    def parse_stage(self, item):
+        url, page, extracted = item
+        if page and not self.has_servers(extracted):
+            self.stdout.write(self.style.WARNING(f"No more servers found on page {page}. Stopping pagination."))
+            self.pipeline.stop()
+            return None
+
+        servers_data = self.build_servers_data(extracted.records)
+        if not servers_data:
+            self.stdout.write(self.style.WARNING(f"No servers found at {url}"))
+            self.commit_http_cache(url)
+            return None
+
+        self.track_existing(servers_data)
+        return [(url, servers_data)]
+
+    def stream_stage(self, item):
+        """Fetch and parse in one step: each server is passed on as soon as its card closes."""
+        url, page = item
+        if page and self.pipeline.stopped:
+            return
+        self.stdout.write(self.style.NOTICE(f"\nProcessing URL: {url}"))
+
+        found = 0
+        for record in self.stream_page(url):
+            found += 1
+            servers_data = self.build_servers_data([record])
+            if servers_data:
+                self.track_existing(servers_data)
+                yield url, servers_data
+
+        if page and not found:
+            self.stdout.write(self.style.WARNING(f"No more servers found on page {page}. Stopping pagination."))
+            self.pipeline.stop()
+
+    def track_existing(self, servers_data):
+        """Remembers which parsed servers were already in the database."""
+        for server in servers_data:
+            if server["is_existing"]:
+                self.existing_servers.append({
+                    "name": server["server_name"],
+                    "id": server["server_id"]
+                })
+
+    def write_pages(self, pages):
+        """Writer stage: stores several parsed pages in one database batch."""
+        servers_data = [server for _, page_servers in pages for server in page_servers]
+        if self.update_database(servers_data):
+            for url, _ in pages:
+                self.commit_http_cache(url)
+        self.servers_written += len(servers_data)
+
+    def scrape_pipelined(self, existing_servers, parse_workers=0, stream=False):
+        """Fetches, parses and writes on separate threads joined by bounded queues.
+
+        The next page downloads while the previous one is parsed and an
+        earlier batch is written; a full queue makes the stage before it wait.
+        With parse_workers, that many pages are extracted at once in the
+        parse pool. With stream, pages are parsed while they download and
+        servers reach the writer before their page is complete.
+        """
+        self.existing_servers = existing_servers
+        self.servers_written = 0
+        writer = BatchWriter(self.write_pages, WRITE_BATCH_SIZE, size_of=lambda page: len(page[1]))
+        # Streamed items are single servers, so a full batch may queue up for the writer
+        self.pipeline = Pipeline(queue_size=WRITE_BATCH_SIZE if stream else 2)
+        self.pipeline.source('pages', self.iter_pages())
+        if stream:
+            self.pipeline.stage('stream', self.stream_stage)
+        else:
+            self.pipeline.stage('fetch', self.fetch_stage)
+            self.pipeline.stage('extract', self.extract_stage, workers=parse_workers)
+            self.pipeline.stage('parse', self.parse_stage)
+        self.pipeline.stage('write', writer.add, flush=writer.flush)
+
+        stats = self.pipeline.run()
+        self.stdout.write(self.style.NOTICE("\nPipeline throughput:"))
+        for stage_stats in stats:
+            self.stdout.write(self.style.NOTICE(f"  {stage_stats}"))
+        for stage, error in self.pipeline.errors:
+            self.stdout.write(self.style.ERROR(f"Pipeline stage {stage} failed: {error}"))
+        return self.servers_written
+
+    async def fetch_all(self, urls, concurrency):
+        """Fetches every URL on the event loop, yielding (url, html) as each response arrives."""
+        semaphores = {}
+
+        async def fetch(url):
+            host = urlsplit(url).netloc
+            semaphore = semaphores.setdefault(host, asyncio.Semaphore(concurrency))
+            async with semaphore:
+                html = await asyncio.to_thread(self.fetch_data, url)
+            return url, html
+
+        for next_result in asyncio.as_completed([fetch(url) for url in urls]):
+            yield await next_result
+
+    async def scrape_concurrently(self, concurrency, existing_servers):
+        """Fetches the listing and every paginated page at once and processes them as they arrive."""
+        urls = self.get_urls() + [self.get_paginated_url(page) for page in range(1, self.max_pages + 1)]
+        self.stdout.write(
+            self.style.NOTICE(f"Fetching {len(urls)} pages with up to {concurrency} requests per host...")
+        )
+
+        total_servers_processed = 0
+        process_page = sync_to_async(self.process_page)
+        async for url, html in self.fetch_all(urls, concurrency):
+            self.stdout.write(self.style.NOTICE(f"\nProcessing URL: {url}"))
+            total_servers_processed += await process_page(url, html, existing_servers)
+        return total_servers_processed
+
     def handle(self, *args, **kwargs):
         """Main function to run the scraping process."""
         self.stdout.write(self.style.NOTICE("Starting scraping process..."))
@@ -275,80 +417,35 @@ class Command(BaseCommand):
         existing_servers = []
         total_servers_processed = 0
 
-        # First phase: Process main URLs and collect existing servers
-        urls = self.get_urls()
-        for url in urls:
-            self.stdout.write(self.style.NOTICE(f"\nProcessing URL: {url}"))
-            html = self.fetch_data(url)
-            
-            if html:
-                servers_data = self.parse_html(html)
-                if servers_data:
-                    # Track existing servers during parsing
-                    for server in servers_data:
-                        if server["is_existing"]:
-                            existing_servers.append({
-                                "name": server["server_name"],
-                                "id": server["server_id"]
-                            })
-                    
-                    self.update_database(servers_data)
-                    total_servers_processed += len(servers_data)
-                    self.stdout.write(
-                        self.style.SUCCESS(f"Processed {len(servers_data)} servers from {url}")
-                    )
-                else:
-                    self.stdout.write(self.style.WARNING(f"No servers found at {url}"))
-            else:
-                self.stdout.write(self.style.ERROR(f"Failed to retrieve content from {url}"))
-
-            time.sleep(random.uniform(2, 5))
-
-        # Process paginated URLs
-        self.stdout.write(self.style.NOTICE("\nStarting pagination scraping..."))
-        page = 1
-        max_pages = 11
-
-        while page <= max_pages:
-            paginated_url = self.get_paginated_url(page)
-            self.stdout.write(self.style.NOTICE(f"\nProcessing page {page}: {paginated_url}"))
-            
-            html = self.fetch_data(paginated_url)
-            
-            if html:
-                if not self.has_servers(html):
-                    self.stdout.write(self.style.WARNING(f"No more servers found on page {page}. Stopping pagination."))
-                    break
-
-                servers_data = self.parse_html(html)
-                if servers_data:
-                    # Track existing servers during parsing
-                    for server in servers_data:
-                        if server["is_existing"]:
-                            existing_servers.append({
-                                "name": server["server_name"],
-                                "id": server["server_id"]
-                            })
-                    
-                    self.update_database(servers_data)
-                    total_servers_processed += len(servers_data)
-                    self.stdout.write(
-                        self.style.SUCCESS(f"Processed {len(servers_data)} servers from page {page}")
-                    )
-                else:
-                    self.stdout.write(self.style.WARNING(f"No new servers found on page {page}"))
+        self.http_cache = make_http_cache(kwargs['http_cache']) if kwargs.get('http_cache') else get_http_cache()
+        if kwargs.get('stream') and self.http_cache:
+            # Unchanged pages are detected from the full body, which streaming never holds
+            self.stdout.write(self.style.WARNING("The HTTP cache is not used with --stream"))
+            self.http_cache = None
+
+        concurrency = kwargs.get('concurrency') or 0
+        if concurrency > 0:
+            total_servers_processed = asyncio.run(self.scrape_concurrently(concurrency, existing_servers))
+        elif kwargs.get('stream'):
+            total_servers_processed = self.scrape_pipelined(existing_servers, stream=True)
+        else:
+            parse_workers = kwargs.get('parse_workers') or 0
+            if parse_workers > 0:
+                with ParsePool(parse_workers) as self.parse_pool:
+                    total_servers_processed = self.scrape_pipelined(existing_servers, parse_workers)
+                self.parse_pool = None
             else:
-                self.stdout.write(self.style.ERROR(f"Failed to retrieve content from page {page}"))
-                break
-
-            page += 1
-            time.sleep(random.uniform(2, 5))
+                total_servers_processed = self.scrape_pipelined(existing_servers)
 
         # Save existing servers to JSON file after all scraping is done
         self.save_existing_servers_to_json(existing_servers)
 
+        if self.http_cache:
+            self.stdout.write(self.style.NOTICE(f"HTTP cache: {self.http_cache.stats()}"))
+        self.stdout.write(self.style.NOTICE(f"HTTP connections: {get_http_client().stats}"))
+
         self.stdout.write(
             self.style.SUCCESS(
                 f"\nScraping completed. Total servers processed: {total_servers_processed}"
             )
-        )
\ No newline at end of file
+        )
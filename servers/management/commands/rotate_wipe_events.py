@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from servers.partitions import is_partitioned, partition_name, rotate_partitions
+
+
+class Command(BaseCommand):
+    help = 'Adds weekly wipe_events partitions ahead of time and drops the ones past retention'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--weeks-ahead',
+            type=int,
+            default=getattr(settings, 'WIPE_EVENT_PARTITIONS_AHEAD', 4),
+            help='Keep a partition ready for every week up to this many weeks from now'
+        )
+        parser.add_argument(
+            '--retention-weeks',
+            type=int,
+            default=getattr(settings, 'WIPE_EVENT_RETENTION_WEEKS', 52),
+            help='Drop the partitions of weeks older than this'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Print the partitions that would be added and dropped'
+        )
+
+    def handle(self, *args, **kwargs):
+        if not is_partitioned():
+            self.stdout.write(self.style.WARNING("wipe_events is only partitioned on MySQL, nothing to rotate"))
+            return
+
+        added, dropped = rotate_partitions(
+            timezone.now().date(), kwargs['weeks_ahead'], kwargs['retention_weeks'], dry_run=kwargs['dry_run']
+        )
+        prefix = "Would add" if kwargs['dry_run'] else "Added"
+        self.stdout.write(self.style.SUCCESS(f"{prefix} {len(added)} partitions: {', '.join(map(partition_name, added)) or '-'}"))
+        prefix = "Would drop" if kwargs['dry_run'] else "Dropped"
+        self.stdout.write(self.style.SUCCESS(f"{prefix} {len(dropped)} partitions: {', '.join(map(partition_name, dropped)) or '-'}"))
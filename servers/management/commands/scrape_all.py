@@ -0,0 +1,136 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from servers.coordinator import IngestionCoordinator
+from servers.extraction import extract_just_wiped
+from servers.http_cache import NOT_MODIFIED, get_http_cache
+from servers.management.commands.fetch_api_servers import Command as FetchApiServersCommand
+from servers.management.commands.recent_wipes import Command as RecentWipesCommand
+from servers.management.commands.scrape_battlemetrics import Command as ScrapeBattlemetricsCommand
+from servers.management.commands.upcoming_wipes import Command as UpcomingWipesCommand
+from servers.server_index import ServerIdIndex
+from servers.webdriver_pool import DriverPool, default_chrome_options, fast_chrome_options
+
+SOURCES = ['recent_wipes', 'upcoming_wipes', 'fetch_api_servers', 'scrape_battlemetrics']
+
+
+class Command(BaseCommand):
+    help = 'Scrapes every source, merges the servers in memory by source priority and writes them in one batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sources',
+            nargs='+',
+            choices=SOURCES,
+            default=SOURCES,
+            help='Sources to scrape in this run'
+        )
+        parser.add_argument(
+            '--max-pages',
+            type=int,
+            default=None,
+            help='Stop the BattleMetrics API crawl after this many pages'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Print what changed since the last run without writing anything'
+        )
+
+    def source_command(self, command_class):
+        """A source command that shares this run's output and server index."""
+        command = command_class()
+        command.stdout = self.stdout
+        command.style = self.style
+        command.server_index = self.server_index
+        return command
+
+    def collect_recent_wipes(self):
+        command = self.source_command(RecentWipesCommand)
+        command.http_cache = self.http_cache
+        for url, page in command.iter_pages():
+            html = command.fetch_data(url)
+            if not html:
+                if page:
+                    break
+                continue
+            if html is NOT_MODIFIED:
+                continue
+            extracted = extract_just_wiped(html)
+            if page and not command.has_servers(extracted):
+                break
+            self.fetched_urls.append(url)
+            yield command.build_servers_data(extracted.records)
+
+    def collect_upcoming_wipes(self):
+        command = self.source_command(UpcomingWipesCommand)
+        command.http_cache = self.http_cache
+        url = command.get_url()
+        html = command.fetch_data(url)
+        if html and html is not NOT_MODIFIED:
+            self.fetched_urls.append(url)
+            yield command.parse_html(html)
+
+    def collect_fetch_api_servers(self):
+        command = self.source_command(FetchApiServersCommand)
+        if not command.battlemetrics_api_key:
+            self.stdout.write(self.style.WARNING("BattleMetrics API key not set, skipping the API"))
+            return
+        for page, servers_data in command.iter_pages(max_pages=self.max_pages):
+            if not servers_data:
+                break
+            yield servers_data
+
+    def collect_scrape_battlemetrics(self):
+        command = self.source_command(ScrapeBattlemetricsCommand)
+        command.fast_load = getattr(settings, 'SCRAPER_FAST_LOAD', True)
+        command.load_timeout = getattr(settings, 'SCRAPER_LOAD_TIMEOUT', 15)
+        command.first_row_timings = []
+        seen_server_ids = set()
+        pool = DriverPool(
+            size=1,
+            options_factory=fast_chrome_options if command.fast_load else default_chrome_options,
+            block_resources=command.fast_load
+        )
+        with pool:
+            command.driver_pool = pool
+            for page in range(1, command.max_pages + 1):
+                html = command.fetch_data(command.get_paginated_url(page))
+                new_servers, keep_going = command.process_page(
+                    page, command.extract_page(html) if html else None, seen_server_ids
+                )
+                if new_servers:
+                    yield new_servers
+                if not keep_going:
+                    break
+
+    def handle(self, *args, **kwargs):
+        self.server_index = ServerIdIndex.load()
+        self.http_cache = get_http_cache()
+        self.fetched_urls = []
+        self.max_pages = kwargs.get('max_pages')
+        coordinator = IngestionCoordinator()
+
+        for source in kwargs['sources']:
+            self.stdout.write(self.style.NOTICE(f"\nCollecting {source}..."))
+            try:
+                for servers_data in getattr(self, f'collect_{source}')():
+                    coordinator.add(source, servers_data)
+            except Exception as e:
+                # The other sources still get written
+                self.stdout.write(self.style.ERROR(f"Source {source} failed: {e}"))
+
+        self.stdout.write(self.style.NOTICE(f"\n{coordinator.summary()}"))
+        if kwargs.get('dry_run'):
+            result = coordinator.write(self.server_index, dry_run=True)
+            for server_id, server_name, details in result.changes:
+                self.stdout.write(f"{server_id} {server_name}: {'; '.join(details)}")
+            self.stdout.write(self.style.SUCCESS(f"Dry run, nothing written: {result}"))
+            return
+
+        result = coordinator.write(self.server_index)
+        self.stdout.write(self.style.SUCCESS(f"Database updated in one batch: {result}"))
+
+        # Pages are only remembered as unchanged once their servers are stored
+        if self.http_cache:
+            for url in self.fetched_urls:
+                self.http_cache.commit(url)
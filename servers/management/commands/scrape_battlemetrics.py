@@ -1,20 +1,24 @@
 from django.core.management.base import BaseCommand
-from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
 import time
 import random
-from django.utils import timezone
-from datetime import datetime
-import pytz
-from servers.models import Server, WipeSchedule
+from servers.extraction import BATTLEMETRICS_CELL_SELECTOR, extract_battlemetrics
+from servers.ingestion import WRITE_BATCH_SIZE, ingest_servers
+from servers.parse_pool import ParsePool
+from servers.pipeline import BatchWriter, Pipeline
+from servers.rate_limit import get_rate_limiter
+from servers.server_index import ServerIdIndex
+from servers.webdriver_pool import DriverPool, default_chrome_options, fast_chrome_options
 import json
 import os
+from urllib.parse import urlsplit
 
 class Command(BaseCommand):
     help = 'Scrapes Rust servers from BattleMetrics website and saves to database'
+    max_pages = 10
 
     def get_base_url(self):
         """Return the base URL for BattleMetrics."""
@@ -31,251 +35,279 @@ class Command(BaseCommand):
         self.stdout.write(self.style.NOTICE(f"Generated URL: {url}"))  # Debug URL
         return url
 
-    def format_wipe_time(self, dt):
-        """Convert datetime to EST hour format."""
-        est = pytz.timezone('US/Eastern')
-        dt_est = dt.astimezone(est)
-        hour = dt_est.strftime('%I%p').lstrip('0').lower()  # Convert to 1pm format
-        return f"{hour} est"
-
-    def get_day_name(self, dt):
-        """Convert datetime to day name."""
-        return dt.strftime('%A')
+    def wait_for_servers(self, driver, url):
+        """Blocks until the first server cell is rendered or the load timeout expires."""
+        try:
+            WebDriverWait(driver, self.load_timeout).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, BATTLEMETRICS_CELL_SELECTOR))
+            )
+            return True
+        except TimeoutException:
+            self.stdout.write(
+                self.style.WARNING(f"No server rows after {self.load_timeout}s on {url}")
+            )
+            return False
 
     def fetch_data(self, url):
-        """Fetches page content using Selenium."""
-        # Set up the WebDriver (using Chrome in this case)
-        options = webdriver.ChromeOptions()
-        options.add_argument('--headless')  # Run in headless mode (no browser UI)
-        options.add_argument('--disable-gpu')
-        options.add_argument('--no-sandbox')
-        options.add_argument('--window-size=1920,1080')  # Set window size
-        options.add_argument('--disable-dev-shm-usage')  # Overcome limited resource problems
-
-        # Initialize the WebDriver
-        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-
+        """Fetches page content using a pooled Selenium driver."""
         try:
-            driver.get(url)
-            time.sleep(random.uniform(5, 10))  # Wait for the page to load
-            
-            # Wait for the server list to appear
-            driver.implicitly_wait(10)
-            
-            # Print current URL after any redirects
-            self.stdout.write(self.style.NOTICE(f"Current URL after loading: {driver.current_url}"))
-
-            # Take screenshot for debugging (optional)
-            # driver.save_screenshot(f"page_{url.split('page=')[1]}.png")
-
-            html = driver.page_source
+            with self.driver_pool.driver() as driver:
+                # Chrome bypasses the HTTP client, so take a token from the shared limiter here
+                get_rate_limiter().acquire(urlsplit(url).netloc)
+                started = time.monotonic()
+                driver.get(url)
+                if self.fast_load:
+                    found = self.wait_for_servers(driver, url)
+                else:
+                    time.sleep(random.uniform(5, 10))  # Wait for the page to load
+                    
+                    # Wait for the server list to appear
+                    driver.implicitly_wait(10)
+                    found = True
+
+                if found:
+                    elapsed = time.monotonic() - started
+                    self.first_row_timings.append(elapsed)
+                    self.stdout.write(self.style.NOTICE(f"Time to first server row: {elapsed:.2f}s"))
+                
+                # Print current URL after any redirects
+                self.stdout.write(self.style.NOTICE(f"Current URL after loading: {driver.current_url}"))
+
+                # Take screenshot for debugging (optional)
+                # driver.save_screenshot(f"page_{url.split('page=')[1]}.png")
+
+                html = driver.page_source
             self.stdout.write(self.style.SUCCESS(f"Successfully fetched {url}"))
-            
-            # Debug: Print a sample of the HTML to verify content
-            soup = BeautifulSoup(html, "html.parser")
-            server_cells = soup.select("td.css-1su1bxu")
-            self.stdout.write(self.style.NOTICE(f"Number of server cells found: {len(server_cells)}"))
-            if server_cells:
-                first_server = server_cells[0].find('a')
-                if first_server:
-                    self.stdout.write(self.style.NOTICE(f"First server on page: {first_server.text}"))
-            
             return html
         except Exception as e:
             self.stdout.write(self.style.ERROR(f"Error fetching page {url}: {e}"))
             return None
-        finally:
-            driver.quit()
 
-    def has_servers(self, html):
-        """Check if the page has any servers listed."""
-        if not html:
+    def has_servers(self, page):
+        """Check if an extracted page has any servers listed."""
+        if not page:
             return False
-        soup = BeautifulSoup(html, "html.parser")
-        server_cells = soup.select("td.css-1su1bxu")  # Update the selector if needed
-        count = len(server_cells)
-        self.stdout.write(self.style.NOTICE(f"Found {count} servers on this page"))
-        return count > 0
+        self.stdout.write(self.style.NOTICE(f"Found {len(page.records)} servers on this page"))
+        if page.records:
+            self.stdout.write(self.style.NOTICE(f"First server on page: {page.records[0].server_name}"))
+        return page.has_servers
+
+    def extract_page(self, html):
+        """Extracts the server cells of a page, in the parse pool when one is running."""
+        parse_pool = getattr(self, 'parse_pool', None)
+        if parse_pool:
+            return parse_pool.extract('battlemetrics', html)
+        return extract_battlemetrics(html)
 
     def parse_html(self, html):
         """Parses the fetched HTML and extracts server data."""
-        soup = BeautifulSoup(html, "html.parser")
-        server_cells = soup.select("td.css-1su1bxu")  # Update the selector if needed
+        return self.build_servers_data(self.extract_page(html).records)
+
+    def build_servers_data(self, records):
+        """Turns extracted server records into the dicts written to the database."""
         servers_data = []
 
-        # Get all existing server IDs from database for faster lookup
-        existing_server_ids = set(Server.objects.values_list('server_id', flat=True))
+        # Known server IDs are loaded once per run, not once per page
+        existing_server_ids = self.get_server_index()
 
-        for cell in server_cells:
-            try:
-                # Get server link and extract ID
-                server_link = cell.find('a')  # Simplified selector for the anchor tag
-                if not server_link:
-                    continue
-
-                server_id = server_link['href'].split('/')[-1]
-                try:
-                    server_id = int(server_id)
-                except ValueError:
-                    continue
-
-                server_name = server_link.text.strip()
-
-
-                # Try to determine max group from server name
-                name_lower = server_name.lower()
-                max_group = None
-                if 'quad' in name_lower:
-                    max_group = 4
-                elif 'trio' in name_lower:
-                    max_group = 3
-                elif 'duo' in name_lower and 'trio' not in name_lower:
-                    max_group = 2
-                elif 'solo' in name_lower and 'duo' not in name_lower and 'trio' not in name_lower:
-                    max_group = 1
-
-                # For now, just use current time as we're focusing on basic data
-                wipe_dt = datetime.now(pytz.UTC)
-
-                # Check if this is a new server or an existing one
-                is_existing = server_id in existing_server_ids
-
-                servers_data.append({
-                    "server_id": server_id,
-                    "server_name": server_name,
-                    "wipe_time": self.format_wipe_time(wipe_dt),
-                    "wipe_day": self.get_day_name(wipe_dt),
-                    "max_group": max_group,
-                    "is_existing": is_existing
-                })
-
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f"Error parsing server cell: {e}"))
-                continue
+        for record in records:
+            # Without a known wipe time only the server row is stored, never a guessed slot
+            servers_data.append({
+                "server_id": record.server_id,
+                "server_name": record.server_name,
+                "wiped_at": record.wipe_dt,
+                "max_group": record.max_group,
+                "is_existing": record.server_id in existing_server_ids
+            })
 
         return servers_data
 
+    def get_server_index(self):
+        """Run-scoped index of known server IDs, loaded on first use."""
+        if getattr(self, 'server_index', None) is None:
+            self.server_index = ServerIdIndex.load()
+        return self.server_index
+
     def update_database(self, servers_data):
-        """Updates the database with new servers and additional wipe schedules."""
+        """Writes a batch of servers and their wipe schedules to the database."""
+        try:
+            result = ingest_servers(servers_data, self.get_server_index(), source='scrape_battlemetrics')
+            self.stdout.write(self.style.SUCCESS(f"Database updated: {result}"))
+            return result
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"Error updating database: {e}"))
+            return None
+
+    def process_page(self, page, extracted, seen_server_ids):
+        """Handles one extracted page. Returns (servers not seen earlier in the run, whether to keep paginating)."""
+        if extracted is None:
+            self.stdout.write(self.style.ERROR(f"Failed to retrieve content from page {page}"))
+            return [], False
+
+        if not self.has_servers(extracted):
+            self.stdout.write(
+                self.style.WARNING(f"No more servers found on page {page}. Stopping pagination.")
+            )
+            return [], False
+
+        servers_data = self.build_servers_data(extracted.records)
+        if not servers_data:
+            self.stdout.write(self.style.WARNING(f"No servers found on page {page}"))
+            return [], False
+
+        # Check for duplicate servers
+        new_servers = []
         for server in servers_data:
-            try:
-                # Check if server exists
-                existing_server = Server.objects.filter(server_id=server["server_id"]).first()
-                
-                if existing_server:
-                    server["is_existing"] = True
-                    # Check if this wipe schedule already exists
-                    existing_schedule = WipeSchedule.objects.filter(
-                        server=existing_server,
-                        day_name=server["wipe_day"],
-                        wipe_hour=server["wipe_time"]
-                    ).first()
-
-                    if not existing_schedule:
-                        # Add new wipe schedule for existing server
-                        WipeSchedule.objects.create(
-                            server=existing_server,
-                            day_name=server["wipe_day"],
-                            wipe_hour=server["wipe_time"]
-                        )
-                        self.stdout.write(
-                            self.style.SUCCESS(
-                                f"Added new wipe schedule for existing server: {server['server_name']} - "
-                                f"{server['wipe_day']} at {server['wipe_time']}"
-                            )
-                        )
-                    else:
-                        self.stdout.write(
-                            self.style.WARNING(
-                                f"Skipping duplicate wipe schedule for server: {server['server_name']} - "
-                                f"{server['wipe_day']} at {server['wipe_time']}"
-                            )
-                        )
-                else:
-                    # Create new server
-                    new_server = Server.objects.create(
-                        server_id=server["server_id"],
-                        server_name=server["server_name"],
-                        max_group=server["max_group"]
-                    )
-
-                    # Create first wipe schedule
-                    WipeSchedule.objects.create(
-                        server=new_server,
-                        day_name=server["wipe_day"],
-                        wipe_hour=server["wipe_time"]
-                    )
-                    self.stdout.write(
-                        self.style.SUCCESS(
-                            f"Added new server with wipe schedule: {server['server_name']} - "
-                            f"{server['wipe_day']} at {server['wipe_time']}"
-                        )
-                    )
-            except Exception as e:
+            if server["server_id"] not in seen_server_ids:
+                seen_server_ids.add(server["server_id"])
+                new_servers.append(server)
+            else:
                 self.stdout.write(
-                    self.style.ERROR(f"Error updating database for server {server['server_name']}: {e}")
+                    self.style.WARNING(f"Duplicate server found: {server['server_name']} (ID: {server['server_id']})")
                 )
 
+        if not new_servers:
+            self.stdout.write(self.style.WARNING("No new servers found on this page"))
+            # We've seen servers before and now only get duplicates
+            self.stdout.write(self.style.WARNING("Only found duplicate servers, stopping pagination"))
+            return [], False
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Parsed {len(new_servers)} new servers from page {page}")
+        )
+        return new_servers, True
+
+    def fetch_stage(self, page):
+        if self.pipeline.stopped:
+            return None  # An earlier page ended pagination
+        self.stdout.write(self.style.NOTICE(f"\nProcessing page {page}..."))
+        return [(page, self.fetch_data(self.get_paginated_url(page)))]
+
+    def extract_stage(self, item):
+        page, html = item
+        return [(page, self.extract_page(html) if html else None)]
+
+    def parse_stage(self, item):
+        """Processes pages in page order; fetch and extract workers finish out of order.
+
+        The stop checks in process_page assume every earlier page was seen,
+        so a page waits here until the ones before it arrive. Pages past
+        the one that ended pagination are dropped.
+        """
+        page, extracted = item
+        self.pending_pages[page] = extracted
+        while self.next_page in self.pending_pages and not self.parse_stopped:
+            page = self.next_page
+            extracted = self.pending_pages.pop(page)
+            self.next_page += 1
+            new_servers, keep_going = self.process_page(page, extracted, self.seen_server_ids)
+            if new_servers:
+                yield new_servers
+            if not keep_going:
+                self.parse_stopped = True
+                self.pipeline.stop()
+
+    def parse_flush(self):
+        """Pages still waiting at the end follow one that never arrived, so pagination ended there."""
+        if self.pending_pages and not self.parse_stopped:
+            self.stdout.write(self.style.ERROR(
+                f"Page {self.next_page} was never parsed, dropping pages {', '.join(map(str, sorted(self.pending_pages)))}"
+            ))
+        self.pending_pages = {}
+
+    def write_pages(self, pages):
+        """Writer stage: stores several parsed pages in one database batch."""
+        servers_data = [server for page_servers in pages for server in page_servers]
+        self.update_database(servers_data)
+        self.servers_written += len(servers_data)
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--drivers',
+            type=int,
+            default=2,
+            help='Number of Chrome instances kept alive to fetch pages in parallel'
+        )
+        parser.add_argument(
+            '--recycle-after',
+            type=int,
+            default=20,
+            help='Restart a Chrome instance after it has served this many pages'
+        )
+        parser.add_argument(
+            '--fast-load',
+            action='store_true',
+            help='Use the eager page-load strategy, block heavy resources and stop waiting at the first server row'
+        )
+        parser.add_argument(
+            '--load-timeout',
+            type=float,
+            default=15,
+            help='Seconds to wait for the first server row in --fast-load mode'
+        )
+        parser.add_argument(
+            '--parse-workers',
+            type=int,
+            default=0,
+            help='Parse pages in N worker processes instead of the scraping process (0 = in-process)'
+        )
+
     def handle(self, *args, **kwargs):
         """Main function to run the scraping process."""
         self.stdout.write(self.style.NOTICE("Starting BattleMetrics scraping process..."))
         
-        total_servers_processed = 0
-        page = 1
-        max_pages = 10
-        all_servers_data = []
-        seen_server_ids = set()  # Track seen server IDs
-
-        while page <= max_pages:
-            self.stdout.write(self.style.NOTICE(f"\nProcessing page {page}..."))
-            
-            url = self.get_paginated_url(page)
-            html = self.fetch_data(url)
-            
-            if html:
-                if not self.has_servers(html):
-                    self.stdout.write(
-                        self.style.WARNING(f"No more servers found on page {page}. Stopping pagination.")
-                    )
-                    break
-
-                servers_data = self.parse_html(html)
-                if servers_data:
-                    # Check for duplicate servers
-                    new_servers = []
-                    for server in servers_data:
-                        if server["server_id"] not in seen_server_ids:
-                            seen_server_ids.add(server["server_id"])
-                            new_servers.append(server)
-                        else:
-                            self.stdout.write(
-                                self.style.WARNING(f"Duplicate server found: {server['server_name']} (ID: {server['server_id']})")
-                            )
-                    
-                    if new_servers:
-                        all_servers_data.extend(new_servers)
-                        self.update_database(new_servers)
-                        total_servers_processed += len(new_servers)
-                        self.stdout.write(
-                            self.style.SUCCESS(f"Processed {len(new_servers)} new servers from page {page}")
-                        )
-                    else:
-                        self.stdout.write(self.style.WARNING("No new servers found on this page"))
-                        if len(seen_server_ids) > 0:  # If we've seen servers before and now getting all duplicates
-                            self.stdout.write(self.style.WARNING("Only found duplicate servers, stopping pagination"))
-                            break
-                else:
-                    self.stdout.write(self.style.WARNING(f"No servers found on page {page}"))
-                    break
-            else:
-                self.stdout.write(self.style.ERROR(f"Failed to retrieve content from page {page}"))
-                break
+        self.seen_server_ids = set()  # Track seen server IDs
+        self.servers_written = 0
+        self.pending_pages = {}  # Pages fetched ahead of the next one to parse
+        self.next_page = 1
+        self.parse_stopped = False
 
-            page += 1
-            time.sleep(random.uniform(3, 6))  # Increased delay between pages
+        self.fast_load = kwargs.get('fast_load', False)
+        self.load_timeout = kwargs.get('load_timeout') or 15
+        self.first_row_timings = []
 
+        pool = DriverPool(
+            size=kwargs.get('drivers') or 2,
+            recycle_after=kwargs.get('recycle_after') or 20,
+            options_factory=fast_chrome_options if self.fast_load else default_chrome_options,
+            block_resources=self.fast_load
+        )
+        parse_workers = kwargs.get('parse_workers') or 0
+        self.parse_pool = ParsePool(parse_workers) if parse_workers > 0 else None
+        writer = BatchWriter(self.write_pages, WRITE_BATCH_SIZE)
+        with pool:
+            self.driver_pool = pool
+            # One fetch worker per driver; parsing and writing overlap with the page loads
+            self.pipeline = (
+                Pipeline(queue_size=pool.size)
+                .source('pages', range(1, self.max_pages + 1))
+                .stage('fetch', self.fetch_stage, workers=pool.size)
+                .stage('extract', self.extract_stage, workers=parse_workers)
+                .stage('parse', self.parse_stage, flush=self.parse_flush)
+                .stage('write', writer.add, flush=writer.flush)
+            )
+            try:
+                stats = self.pipeline.run()
+            finally:
+                if self.parse_pool:
+                    self.parse_pool.close()
+
+        self.stdout.write(self.style.NOTICE("\nPipeline throughput:"))
+        for stage_stats in stats:
+            self.stdout.write(self.style.NOTICE(f"  {stage_stats}"))
+        for stage, error in self.pipeline.errors:
+            self.stdout.write(self.style.ERROR(f"Pipeline stage {stage} failed: {error}"))
+
+        if self.first_row_timings:
+            self.stdout.write(
+                self.style.NOTICE(
+                    f"\nTime to first server row over {len(self.first_row_timings)} pages: "
+                    f"avg {sum(self.first_row_timings) / len(self.first_row_timings):.2f}s, "
+                    f"max {max(self.first_row_timings):.2f}s"
+                )
+            )
         self.stdout.write(
             self.style.SUCCESS(
-                f"\nScraping completed. Total unique servers processed: {total_servers_processed}"
+                f"\nScraping completed. Total unique servers processed: {self.servers_written}"
             )
-        ) 
+        )
@@ -18,4 +18,14 @@ class Command(BaseCommand):
             task="servers.tasks.scrape_and_store_server_data"
         )
 
+        # Partitions are created weeks ahead, so a daily check is plenty
+        daily, created = IntervalSchedule.objects.get_or_create(
+            every=1, period=IntervalSchedule.DAYS
+        )
+        PeriodicTask.objects.get_or_create(
+            interval=daily,
+            name="Rotate Wipe Event Partitions",
+            task="servers.tasks.rotate_wipe_event_partitions"
+        )
+
         self.stdout.write(self.style.SUCCESS('Periodic task setup successfully!'))
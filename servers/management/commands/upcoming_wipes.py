@@ -1,54 +1,105 @@
 from django.core.management.base import BaseCommand
-from bs4 import BeautifulSoup
 import requests
-from django.utils import timezone
-from datetime import datetime
-from servers.models import Server
+from servers.http_client import get_http_client
+from servers.http_cache import NOT_MODIFIED, get_http_cache, make_http_cache
+from servers.extraction import extract_just_wiped
+from servers.ingestion import ingest_servers
+from servers.server_index import ServerIdIndex
 
 class Command(BaseCommand):
     help = 'Scrapes upcoming wipes from Just-Wiped and saves new servers to database'
 
-    def handle(self, *args, **kwargs):
-        url = 'https://just-wiped.net/upcoming-wipes?region=europe&max_group=&s_type=&min_rating=40&difficulty='
+    def get_url(self):
+        """URL of the upcoming wipes listing."""
+        return 'https://just-wiped.net/upcoming-wipes?region=europe&max_group=&s_type=&min_rating=40&difficulty='
+
+    def fetch_data(self, url):
+        """Fetches the listing page, or returns NOT_MODIFIED when the HTTP cache says it is unchanged."""
+        http_cache = getattr(self, 'http_cache', None)
         headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(url, headers=headers)
+        if http_cache:
+            headers.update(http_cache.request_headers(url))
+        try:
+            response = get_http_client().get(url, headers=headers)
+        except requests.RequestException as e:
+            self.stdout.write(self.style.ERROR(f"Failed to retrieve the webpage: {e}"))
+            return None
 
+        if http_cache and response.status_code in (200, 304) and http_cache.is_unchanged(url, response):
+            self.stdout.write(self.style.NOTICE(f"Unchanged since last run: {url}"))
+            return NOT_MODIFIED
         if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            timeago_elements = soup.find_all(class_='timeago')
-            server_links = soup.find_all('a', title="Open the server details page")
-
-            for timeago_element, server_link in zip(timeago_elements, server_links):
-                try:
-                    wipe_time = datetime.fromisoformat(timeago_element['datetime']) if 'datetime' in timeago_element.attrs else timezone.now()
-                    server_name = server_link.get_text(strip=True)
-                    server_id = int(server_link['href'].split('/')[-1]) if 'href' in server_link.attrs else None
-                    max_group = None
-
-                    if server_id:
-                        if not Server.objects.filter(server_id=server_id).exists():
-                            Server.objects.create(
-                                server_id=server_id,
-                                server_name=server_name,
-                                wipe_time=wipe_time,
-                                max_group=max_group
-                            )
-                            self.stdout.write(
-                                self.style.SUCCESS(f"Added new server: {server_name} (ID: {server_id})")
-                            )
-                        else:
-                            self.stdout.write(
-                                self.style.WARNING(f"Server already exists: {server_name} (ID: {server_id})")
-                            )
-
-                except Exception as e:
-                    self.stdout.write(
-                        self.style.ERROR(f"Error processing server: {e}")
-                    )
-                    continue
-
-            self.stdout.write(self.style.SUCCESS("Scraping completed."))
-        else:
-            self.stdout.write(
-                self.style.ERROR(f"Failed to retrieve the webpage, status code: {response.status_code}")
-            )
\ No newline at end of file
+            return response.text
+
+        self.stdout.write(
+            self.style.ERROR(f"Failed to retrieve the webpage, status code: {response.status_code}")
+        )
+        return None
+
+    def parse_html(self, html):
+        """Parses the fetched HTML and extracts server data."""
+        return self.build_servers_data(extract_just_wiped(html).records)
+
+    def build_servers_data(self, records):
+        """Turns extracted server records into the dicts written to the database."""
+        existing_server_ids = self.get_server_index()
+        servers_data = []
+
+        for record in records:
+            servers_data.append({
+                "server_id": record.server_id,
+                "server_name": record.server_name,
+                "wiped_at": record.wipe_dt,
+                "max_group": record.max_group,
+                "is_existing": record.server_id in existing_server_ids
+            })
+
+        return servers_data
+
+    def get_server_index(self):
+        """Run-scoped index of known server IDs, loaded on first use."""
+        if getattr(self, 'server_index', None) is None:
+            self.server_index = ServerIdIndex.load()
+        return self.server_index
+
+    def update_database(self, servers_data):
+        """Writes a batch of servers and their wipe schedules to the database."""
+        try:
+            result = ingest_servers(servers_data, self.get_server_index(), source='upcoming_wipes')
+            self.stdout.write(self.style.SUCCESS(f"Database updated: {result}"))
+            return result
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"Error updating database: {e}"))
+            return None
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--http-cache',
+            choices=['file', 'redis'],
+            help='Revalidate the page with ETag/Last-Modified and skip it when it did not change'
+        )
+
+    def handle(self, *args, **kwargs):
+        self.http_cache = make_http_cache(kwargs['http_cache']) if kwargs.get('http_cache') else get_http_cache()
+        url = self.get_url()
+        html = self.fetch_data(url)
+        if html is NOT_MODIFIED:
+            self.stdout.write(self.style.SUCCESS("Upcoming wipes unchanged, nothing to do."))
+            return
+        if not html:
+            return
+
+        servers_data = self.parse_html(html)
+        for server in servers_data:
+            if server["is_existing"]:
+                self.stdout.write(
+                    self.style.WARNING(f"Server already exists: {server['server_name']} (ID: {server['server_id']})")
+                )
+            else:
+                self.stdout.write(
+                    self.style.SUCCESS(f"Added new server: {server['server_name']} (ID: {server['server_id']})")
+                )
+
+        if self.update_database(servers_data) and self.http_cache:
+            self.http_cache.commit(url)
+        self.stdout.write(self.style.SUCCESS("Scraping completed."))
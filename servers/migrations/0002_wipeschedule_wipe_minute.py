@@ -0,0 +1,85 @@
+import re
+
+from django.db import migrations, models
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+HOUR_PATTERN = re.compile(r'^(\d{1,2})(am|pm) est$')
+
+# The scrapers wrote the UTC weekday next to the US/Eastern hour; EST is assumed for the hour
+EST_OFFSET_HOURS = 5
+
+
+def legacy_wipe_minute(day_name, wipe_hour):
+    """UTC minute of week for a ("Thursday", "4pm est") pair, or None when it can't be read."""
+    match = HOUR_PATTERN.match((wipe_hour or '').strip().lower())
+    if day_name not in DAYS or not match:
+        return None
+    hour = int(match.group(1)) % 12 + (12 if match.group(2) == 'pm' else 0)
+    utc_hour = (hour + EST_OFFSET_HOURS) % 24
+    return DAYS.index(day_name) * 24 * 60 + utc_hour * 60
+
+
+def fill_wipe_minutes(apps, schema_editor):
+    WipeSchedule = apps.get_model('servers', 'WipeSchedule')
+    unreadable = []
+    schedules = WipeSchedule.objects.only('id', 'day_name', 'wipe_hour').iterator(chunk_size=2000)
+    pending = []
+    for schedule in schedules:
+        schedule.wipe_minute = legacy_wipe_minute(schedule.day_name, schedule.wipe_hour)
+        if schedule.wipe_minute is None:
+            unreadable.append(schedule.id)
+            continue
+        pending.append(schedule)
+        if len(pending) >= 2000:
+            WipeSchedule.objects.bulk_update(pending, ['wipe_minute'])
+            pending = []
+    if pending:
+        WipeSchedule.objects.bulk_update(pending, ['wipe_minute'])
+    if unreadable:
+        WipeSchedule.objects.filter(id__in=unreadable).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wipeschedule',
+            name='wipe_minute',
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='wipeschedule',
+            name='wiped_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_wipe_minutes, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='wipeschedule',
+            unique_together=set(),
+        ),
+        migrations.RemoveField(
+            model_name='wipeschedule',
+            name='day_name',
+        ),
+        migrations.RemoveField(
+            model_name='wipeschedule',
+            name='wipe_hour',
+        ),
+        migrations.AlterField(
+            model_name='wipeschedule',
+            name='wipe_minute',
+            field=models.PositiveSmallIntegerField(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='wipeschedule',
+            unique_together={('server', 'wipe_minute')},
+        ),
+        migrations.AddIndex(
+            model_name='wipeschedule',
+            index=models.Index(fields=['wipe_minute', 'server'], name='wipe_schedules_minute_idx'),
+        ),
+    ]
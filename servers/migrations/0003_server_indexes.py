@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servers', '0002_wipeschedule_wipe_minute'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='server',
+            index=models.Index(fields=['max_group', 'server_id'], name='servers_group_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='server',
+            index=models.Index(fields=['server_name'], name='servers_name_idx'),
+        ),
+    ]
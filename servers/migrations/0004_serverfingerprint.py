@@ -0,0 +1,22 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servers', '0003_server_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServerFingerprint',
+            fields=[
+                ('server', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fingerprint', serialize=False, to='servers.server')),
+                ('digest', models.BigIntegerField()),
+            ],
+            options={
+                'db_table': 'server_fingerprints',
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+from datetime import date, timedelta
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Weekly partitions created up front; rotate_wipe_events keeps adding them afterwards
+INITIAL_WEEKS = 5
+
+
+def partition_events(apps, schema_editor):
+    """Range-partitions wipe_events by week on MySQL. Other backends keep a plain table."""
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    monday = date.today() - timedelta(days=date.today().weekday())
+    partitions = [
+        f"PARTITION p{week:%Y%m%d} VALUES LESS THAN (TO_DAYS('{week + timedelta(weeks=1):%Y-%m-%d}'))"
+        for week in (monday + timedelta(weeks=offset) for offset in range(INITIAL_WEEKS))
+    ]
+    partitions.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+    # Every unique key of a partitioned table must contain the partitioning column
+    schema_editor.execute("ALTER TABLE wipe_events DROP PRIMARY KEY, ADD PRIMARY KEY (id, wiped_at)")
+    schema_editor.execute(
+        f"ALTER TABLE wipe_events PARTITION BY RANGE (TO_DAYS(wiped_at)) ({', '.join(partitions)})"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servers', '0004_serverfingerprint'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='serverfingerprint',
+            name='digest',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='serverfingerprint',
+            name='last_wiped_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='WipeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('wiped_at', models.DateTimeField()),
+                ('source', models.CharField(max_length=32)),
+                ('server', models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='wipe_events', to='servers.server')),
+            ],
+            options={
+                'db_table': 'wipe_events',
+                'indexes': [models.Index(fields=['server', 'wiped_at'], name='wipe_events_server_idx')],
+            },
+        ),
+        # The table is dropped on reverse, partitions and all
+        migrations.RunPython(partition_events, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,9 @@
 from django.db import models
+from django.db.models import Q
 from django.core.management.base import BaseCommand
-from datetime import datetime
+from django.utils import timezone
+from datetime import datetime, timedelta
+from servers.wipe_times import format_wipe_day, format_wipe_hour, minute_ranges, next_occurrence
 
 class Server(models.Model):
     server_id = models.IntegerField(primary_key=True)  # Make this the primary key
@@ -9,6 +12,11 @@ class Server(models.Model):
 
     class Meta:
         db_table = 'servers'  # This tells Django to use the 'servers' table name
+        indexes = [
+            # Filtered /servers pages walk these in server_id order
+            models.Index(fields=['max_group', 'server_id'], name='servers_group_idx'),
+            models.Index(fields=['server_name'], name='servers_name_idx'),
+        ]
 
     def __str__(self):
         return self.server_name if self.server_name else "Unnamed Server"
@@ -26,14 +34,87 @@ class Server(models.Model):
 
         # Rest of your update_database code...
 
+class WipeScheduleQuerySet(models.QuerySet):
+    def wiping_between(self, start, end):
+        """Schedules whose weekly slot falls between two datetimes, as a range scan on wipe_minute."""
+        window = Q()
+        for low, high in minute_ranges(start, end):
+            window |= Q(wipe_minute__gte=low, wipe_minute__lt=high)
+        return self.filter(window)
+
+    def wiping_within(self, hours, now=None):
+        """Schedules wiping in the next `hours` hours."""
+        now = now or timezone.now()
+        return self.wiping_between(now, now + timedelta(hours=hours))
+
+
 class WipeSchedule(models.Model):
     server = models.ForeignKey(Server, on_delete=models.CASCADE, related_name='wipe_schedules')
-    day_name = models.CharField(max_length=10)  # Monday, Tuesday, etc.
-    wipe_hour = models.CharField(max_length=10)  # Store time like "4pm est"
+    wipe_minute = models.PositiveSmallIntegerField()  # UTC minutes since Monday 00:00, truncated to the hour
+    wiped_at = models.DateTimeField(null=True, blank=True)  # Timestamp the slot was first seen with
+
+    objects = WipeScheduleQuerySet.as_manager()
 
     class Meta:
         db_table = 'wipe_schedules'
-        unique_together = ['server', 'day_name', 'wipe_hour']  # Prevent exact duplicates
+        unique_together = ['server', 'wipe_minute']  # Prevent exact duplicates
+        indexes = [
+            models.Index(fields=['wipe_minute', 'server'], name='wipe_schedules_minute_idx'),
+        ]
+
+    @property
+    def next_wipe(self):
+        return next_occurrence(self.wipe_minute, timezone.now())
+
+    @property
+    def day_name(self):
+        """Display weekday like "Thursday", derived from wipe_minute."""
+        return format_wipe_day(self.next_wipe)
+
+    @property
+    def wipe_hour(self):
+        """Display hour like "4pm est", derived from wipe_minute."""
+        return format_wipe_hour(self.next_wipe)
 
     def __str__(self):
         return f"{self.server.server_name} - {self.day_name} at {self.wipe_hour}"
+
+
+class ServerFingerprint(models.Model):
+    server = models.OneToOneField(Server, on_delete=models.CASCADE, primary_key=True, related_name='fingerprint')
+    digest = models.BigIntegerField(null=True)  # Hash of the name, group size and weekly slots last scraped; None forces a full diff
+    last_wiped_at = models.DateTimeField(null=True, blank=True)  # Latest wipe already logged as a WipeEvent
+
+    class Meta:
+        db_table = 'server_fingerprints'
+
+
+class WipeEventQuerySet(models.QuerySet):
+    def observed_between(self, start, end):
+        """Events in [start, end); the range on wiped_at lets MySQL read only the matching weekly partitions."""
+        return self.filter(wiped_at__gte=start, wiped_at__lt=end)
+
+
+class WipeEvent(models.Model):
+    """One observed wipe, appended by ingestion and never updated.
+
+    On MySQL the table is range-partitioned by week on wiped_at (see
+    servers.partitions), so its primary key is (id, wiped_at) and the
+    server reference carries no foreign key constraint.
+    """
+    server = models.ForeignKey(
+        Server, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='wipe_events'
+    )
+    wiped_at = models.DateTimeField()
+    source = models.CharField(max_length=32)  # Scraper that reported the wipe
+
+    objects = WipeEventQuerySet.as_manager()
+
+    class Meta:
+        db_table = 'wipe_events'
+        indexes = [
+            models.Index(fields=['server', 'wiped_at'], name='wipe_events_server_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.server_id} wiped at {self.wiped_at:%Y-%m-%d %H:%M} ({self.source})"
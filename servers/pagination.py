@@ -0,0 +1,10 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class ServerCursorPagination(CursorPagination):
+    """Keyset pages over the primary key, so every page costs the same however deep it is."""
+    ordering = 'server_id'
+    page_size = getattr(settings, 'SERVERS_PAGE_SIZE', 50)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'SERVERS_MAX_PAGE_SIZE', 500)
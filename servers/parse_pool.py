@@ -0,0 +1,48 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from servers.extraction import PageExtract, ServerRecord, extract_battlemetrics, extract_just_wiped, get_backend
+
+EXTRACTORS = {
+    'just_wiped': extract_just_wiped,
+    'battlemetrics': extract_battlemetrics,
+}
+
+
+def _extract(source, raw, backend):
+    """Runs in a worker process: page bytes in, plain tuples out so the reply pickles small."""
+    page = EXTRACTORS[source](raw, backend)
+    return [tuple(record) for record in page.records], page.has_servers
+
+
+class ParsePool:
+    """Process pool that runs the page extractors on every core.
+
+    Tree building holds the GIL, so threads cannot parse two pages at once.
+    Callers block in extract() until their page is done, so N pipeline
+    threads calling it keep N worker processes busy.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+        # Resolved here because worker processes never load Django settings
+        self.backend = get_backend()
+        # Spawned, not forked: the pool is started from pipeline threads
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+
+    def extract(self, source, html):
+        raw = html.encode('utf-8') if isinstance(html, str) else html
+        records, has_servers = self.executor.submit(_extract, source, raw, self.backend).result()
+        return PageExtract([ServerRecord(*record) for record in records], has_servers)
+
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
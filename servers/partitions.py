@@ -0,0 +1,94 @@
+from datetime import date, timedelta
+
+from django.db import connection
+
+EVENTS_TABLE = 'wipe_events'
+CATCH_ALL = 'pmax'
+
+
+def week_start(day):
+    """Monday of the week `day` falls in."""
+    return day - timedelta(days=day.weekday())
+
+
+def partition_name(week):
+    return f"p{week:%Y%m%d}"
+
+
+def partition_week(name):
+    """Week a partition holds, or None for the catch-all."""
+    if name == CATCH_ALL:
+        return None
+    return date(int(name[1:5]), int(name[5:7]), int(name[7:9]))
+
+
+def partition_definition(week):
+    """One weekly partition: rows wiped before the following Monday."""
+    return f"PARTITION {partition_name(week)} VALUES LESS THAN (TO_DAYS('{week + timedelta(weeks=1):%Y-%m-%d}'))"
+
+
+def is_partitioned():
+    return connection.vendor == 'mysql'
+
+
+def existing_weeks():
+    """Weeks with a partition in the events table, oldest first."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL "
+            "ORDER BY PARTITION_ORDINAL_POSITION",
+            [EVENTS_TABLE]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    return [week for week in map(partition_week, names) if week is not None]
+
+
+def add_partitions(today, weeks_ahead, dry_run=False):
+    """Splits the catch-all so every week up to `weeks_ahead` from today has its own partition.
+
+    The catch-all stays empty as long as this runs ahead of time, so the
+    reorganisation moves no rows. Returns the weeks added.
+    """
+    weeks = existing_weeks()
+    first = week_start(today) if not weeks else weeks[-1] + timedelta(weeks=1)
+    last = week_start(today) + timedelta(weeks=weeks_ahead)
+    new_weeks = []
+    while first <= last:
+        new_weeks.append(first)
+        first += timedelta(weeks=1)
+    if new_weeks and not dry_run:
+        definitions = [partition_definition(week) for week in new_weeks]
+        definitions.append(f"PARTITION {CATCH_ALL} VALUES LESS THAN MAXVALUE")
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"ALTER TABLE {EVENTS_TABLE} REORGANIZE PARTITION {CATCH_ALL} INTO ({', '.join(definitions)})"
+            )
+    return new_weeks
+
+
+def drop_partitions(today, retention_weeks, dry_run=False):
+    """Drops the partitions of weeks older than the retention window, a metadata change instead of a DELETE.
+
+    The newest week is always kept so the table keeps at least one range
+    partition next to the catch-all. Returns the weeks dropped.
+    """
+    cutoff = week_start(today) - timedelta(weeks=retention_weeks)
+    weeks = existing_weeks()
+    old_weeks = [week for week in weeks[:-1] if week < cutoff]
+    if old_weeks and not dry_run:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"ALTER TABLE {EVENTS_TABLE} DROP PARTITION {', '.join(partition_name(week) for week in old_weeks)}"
+            )
+    return old_weeks
+
+
+def rotate_partitions(today, weeks_ahead, retention_weeks, dry_run=False):
+    """Adds the coming weeks' partitions and drops expired ones. Returns (weeks added, weeks dropped)."""
+    if not is_partitioned():
+        return [], []
+    return (
+        add_partitions(today, weeks_ahead, dry_run),
+        drop_partitions(today, retention_weeks, dry_run),
+    )
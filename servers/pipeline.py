@@ -0,0 +1,200 @@
+import queue
+import threading
+import time
+
+from django.db import connections
+
+_DONE = object()
+
+
+class StageStats:
+    """Items in and out of one stage and the time its workers spent working."""
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.items_in = 0
+        self.items_out = 0
+        self.busy = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, items_out, busy):
+        with self._lock:
+            self.items_in += 1
+            self.items_out += items_out
+            self.busy += busy
+
+    def __str__(self):
+        rate = self.items_in / self.busy if self.busy else 0
+        return (
+            f"{self.name}: {self.items_in} in, {self.items_out} out, "
+            f"{self.busy:.2f}s busy over {self.workers} worker(s), {rate:.1f} items/s"
+        )
+
+
+class BatchWriter:
+    """Collects items and hands them to `write` in batches of at least `batch_size` rows.
+
+    `size_of` tells how many rows one item holds (a page of servers, say).
+    """
+
+    def __init__(self, write, batch_size=500, size_of=len):
+        self.write = write
+        self.batch_size = batch_size
+        self.size_of = size_of
+        self._items = []
+        self._rows = 0
+        self._lock = threading.Lock()
+
+    def add(self, item):
+        with self._lock:
+            self._items.append(item)
+            self._rows += self.size_of(item)
+            if self._rows < self.batch_size:
+                return None
+            batch, self._items, self._rows = self._items, [], 0
+        self.write(batch)
+        return [batch]
+
+    def flush(self):
+        with self._lock:
+            batch, self._items, self._rows = self._items, [], 0
+        if batch:
+            self.write(batch)
+            return [batch]
+        return None
+
+
+class Pipeline:
+    """Runs a source and a chain of stages on threads connected by bounded queues.
+
+    A stage function takes one item and returns an iterable of items for
+    the next stage (or None); a generator's items are passed on as it
+    yields them. Because every queue is bounded, a slow stage blocks the
+    one feeding it, so memory stays flat however many items flow through.
+    Any stage may call stop() to end the source early; items already
+    queued still drain through the remaining stages. With several workers
+    a stage's items leave in completion order, not input order.
+    """
+
+    def __init__(self, queue_size=4):
+        self.queue_size = queue_size
+        self.source_name = None
+        self.source_items = None
+        self.stages = []
+        self.stats = []
+        self.errors = []
+        self._stop = threading.Event()
+
+    def source(self, name, items):
+        self.source_name = name
+        self.source_items = items
+        return self
+
+    def stage(self, name, function, workers=1, flush=None):
+        """Adds a stage; `flush` is called once after its last input and may return more items."""
+        self.stages.append((name, function, max(1, workers), flush))
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def stopped(self):
+        return self._stop.is_set()
+
+    def _put_done(self, output, count):
+        for _ in range(count):
+            output.put(_DONE)
+
+    def _run_source(self, output, stats, downstream_workers):
+        iterator = iter(self.source_items)
+        try:
+            while not self._stop.is_set():
+                started = time.monotonic()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                stats.record(1, time.monotonic() - started)
+                output.put(item)
+        except Exception as e:
+            self.errors.append((self.source_name, e))
+            self.stop()
+        finally:
+            # An abandoned generator is closed here so its own cleanup runs on this thread
+            if hasattr(iterator, 'close'):
+                iterator.close()
+            connections.close_all()
+            self._put_done(output, downstream_workers)
+
+    def _run_stage(self, name, function, flush, source, output, stats, finished, downstream_workers):
+        try:
+            while True:
+                item = source.get()
+                if item is _DONE:
+                    break
+                started = time.monotonic()
+                produced = 0
+                waiting = 0.0
+                try:
+                    # Generators are drained as they yield, so results move on before the stage finishes
+                    for result in function(item) or ():
+                        produced += 1
+                        if output is not None:
+                            put_started = time.monotonic()
+                            output.put(result)
+                            waiting += time.monotonic() - put_started
+                except Exception as e:
+                    self.errors.append((name, e))
+                stats.record(produced, time.monotonic() - started - waiting)
+        finally:
+            with finished['lock']:
+                finished['count'] += 1
+                last_worker = finished['count'] == stats.workers
+            if last_worker:
+                if flush is not None:
+                    try:
+                        results = list(flush() or ())
+                    except Exception as e:
+                        self.errors.append((name, e))
+                        results = []
+                    if output is not None:
+                        for result in results:
+                            output.put(result)
+                if output is not None:
+                    self._put_done(output, downstream_workers)
+            connections.close_all()
+
+    def run(self):
+        """Runs the pipeline to completion and returns the per-stage stats."""
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        source_stats = StageStats(self.source_name, 1)
+        self.stats = [source_stats]
+        threads = [threading.Thread(
+            target=self._run_source,
+            args=(queues[0], source_stats, self.stages[0][2]),
+            name=f"pipeline-{self.source_name}",
+            daemon=True
+        )]
+
+        for position, (name, function, workers, flush) in enumerate(self.stages):
+            stats = StageStats(name, workers)
+            self.stats.append(stats)
+            is_last = position + 1 == len(self.stages)
+            output = None if is_last else queues[position + 1]
+            downstream_workers = 0 if is_last else self.stages[position + 1][2]
+            finished = {'count': 0, 'lock': threading.Lock()}
+            for worker in range(workers):
+                threads.append(threading.Thread(
+                    target=self._run_stage,
+                    args=(name, function, flush, queues[position], output, stats, finished, downstream_workers),
+                    name=f"pipeline-{name}-{worker}",
+                    daemon=True
+                ))
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.stats
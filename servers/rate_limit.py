@@ -0,0 +1,204 @@
+import abc
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from django.conf import settings
+from django.utils import timezone
+
+# Responses that mean "slow down"
+THROTTLE_STATUS_CODES = (429, 503)
+NOT_MODIFIED_STATUS = 304
+
+DEFAULT_RATE = 1.0  # requests per second for hosts without an entry in SCRAPER_RATE_LIMITS
+DEFAULT_BURST = 3
+MIN_RATE = 0.05
+MAX_RATE_FACTOR = 4  # a host may ramp up to this multiple of its configured rate
+RATE_STEP = 0.1  # additive increase per successful response
+
+KEY_PREFIX = 'scraper:rate:'
+
+# Takes a token, returns how long the caller has to wait for it (as a string, Lua numbers are truncated)
+RESERVE_SCRIPT = """
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated', 'rate', 'blocked_until')
+local now = tonumber(ARGV[1])
+local rate = tonumber(state[3]) or tonumber(ARGV[2])
+local burst = tonumber(ARGV[3])
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+local blocked_until = tonumber(state[4]) or 0
+
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate) - 1
+local wait = 0
+if tokens < 0 then wait = -tokens / rate end
+if blocked_until - now > wait then wait = blocked_until - now end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now, 'rate', rate)
+redis.call('EXPIRE', KEYS[1], 3600)
+return tostring(wait)
+"""
+
+# Halves the rate on a throttled response (honouring Retry-After), otherwise ramps it up
+FEEDBACK_SCRIPT = """
+local now = tonumber(ARGV[1])
+local throttled = tonumber(ARGV[2])
+local retry_after = tonumber(ARGV[3])
+local default_rate = tonumber(ARGV[4])
+local min_rate = tonumber(ARGV[5])
+local max_rate = tonumber(ARGV[6])
+local rate = tonumber(redis.call('HGET', KEYS[1], 'rate')) or default_rate
+
+if throttled == 1 then
+    rate = math.max(min_rate, rate / 2)
+    local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens')) or 0
+    redis.call('HSET', KEYS[1], 'tokens', math.min(tokens, 0))
+    if retry_after > 0 then
+        redis.call('HSET', KEYS[1], 'blocked_until', now + retry_after)
+    end
+else
+    rate = math.min(max_rate, rate + tonumber(ARGV[7]))
+end
+
+redis.call('HSET', KEYS[1], 'rate', rate)
+redis.call('EXPIRE', KEYS[1], 3600)
+return tostring(rate)
+"""
+
+_shared_limiter = None
+_shared_limiter_lock = threading.Lock()
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return 0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - timezone.now()).total_seconds())
+    except (TypeError, ValueError):
+        return 0
+
+
+def configured_rate(host):
+    return getattr(settings, 'SCRAPER_RATE_LIMITS', {}).get(host, DEFAULT_RATE)
+
+
+class BaseRateLimiter(abc.ABC):
+    """Adaptive per-host token bucket.
+
+    reserve() takes a token and returns how long to wait before sending,
+    acquire() does the waiting. feedback() halves a host's rate on
+    429/503 (blocking it for Retry-After) and adds RATE_STEP back after
+    every 2xx or 304 response, up to MAX_RATE_FACTOR times the configured
+    rate. Other errors leave the rate alone.
+    """
+
+    @abc.abstractmethod
+    def reserve(self, host):
+        """Takes a token and returns the seconds to wait before using it."""
+
+    @abc.abstractmethod
+    def report(self, host, throttled, retry_after):
+        """Slows `host` down when `throttled`, otherwise speeds it up by RATE_STEP."""
+
+    def acquire(self, host):
+        wait = self.reserve(host)
+        if wait > 0:
+            time.sleep(wait)
+
+    def feedback(self, host, status_code, retry_after=None):
+        if status_code in THROTTLE_STATUS_CODES:
+            self.report(host, True, parse_retry_after(retry_after))
+        elif 200 <= status_code < 300 or status_code == NOT_MODIFIED_STATUS:
+            self.report(host, False, 0)
+
+
+class LocalRateLimiter(BaseRateLimiter):
+    """Token buckets shared by the threads of one process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def _bucket(self, host, now):
+        if host not in self._buckets:
+            self._buckets[host] = {
+                'tokens': DEFAULT_BURST,
+                'updated': now,
+                'rate': configured_rate(host),
+                'blocked_until': 0,
+            }
+        return self._buckets[host]
+
+    def reserve(self, host):
+        with self._lock:
+            now = time.time()
+            bucket = self._bucket(host, now)
+            elapsed = max(0, now - bucket['updated'])
+            bucket['tokens'] = min(DEFAULT_BURST, bucket['tokens'] + elapsed * bucket['rate']) - 1
+            bucket['updated'] = now
+            wait = -bucket['tokens'] / bucket['rate'] if bucket['tokens'] < 0 else 0
+            return max(wait, bucket['blocked_until'] - now)
+
+    def report(self, host, throttled, retry_after):
+        with self._lock:
+            now = time.time()
+            bucket = self._bucket(host, now)
+            if throttled:
+                bucket['rate'] = max(MIN_RATE, bucket['rate'] / 2)
+                bucket['tokens'] = min(bucket['tokens'], 0)
+                if retry_after:
+                    bucket['blocked_until'] = now + retry_after
+            else:
+                max_rate = configured_rate(host) * MAX_RATE_FACTOR
+                bucket['rate'] = min(max_rate, bucket['rate'] + RATE_STEP)
+
+
+class RedisRateLimiter(BaseRateLimiter):
+    """Token buckets kept in Redis, shared by every process and Celery worker.
+
+    Falls back to a process-local limiter while Redis is unreachable.
+    """
+
+    def __init__(self, redis_url):
+        import redis
+        self._errors = (redis.RedisError,)
+        self.client = redis.Redis.from_url(redis_url)
+        self._reserve = self.client.register_script(RESERVE_SCRIPT)
+        self._feedback = self.client.register_script(FEEDBACK_SCRIPT)
+        self.fallback = LocalRateLimiter()
+
+    def reserve(self, host):
+        try:
+            return float(self._reserve(
+                keys=[KEY_PREFIX + host],
+                args=[time.time(), configured_rate(host), DEFAULT_BURST]
+            ))
+        except self._errors:
+            return self.fallback.reserve(host)
+
+    def report(self, host, throttled, retry_after):
+        rate = configured_rate(host)
+        try:
+            self._feedback(
+                keys=[KEY_PREFIX + host],
+                args=[time.time(), int(throttled), retry_after, rate, MIN_RATE, rate * MAX_RATE_FACTOR, RATE_STEP]
+            )
+        except self._errors:
+            self.fallback.report(host, throttled, retry_after)
+
+
+def get_rate_limiter():
+    """Process-wide limiter; Redis-backed when SCRAPER_RATE_LIMIT_BACKEND is 'redis'."""
+    global _shared_limiter
+    with _shared_limiter_lock:
+        if _shared_limiter is None:
+            if getattr(settings, 'SCRAPER_RATE_LIMIT_BACKEND', 'local') == 'redis':
+                redis_url = getattr(settings, 'SCRAPER_RATE_LIMIT_URL', settings.CELERY_BROKER_URL)
+                _shared_limiter = RedisRateLimiter(redis_url)
+            else:
+                _shared_limiter = LocalRateLimiter()
+        return _shared_limiter
@@ -0,0 +1,40 @@
+from datetime import date, datetime, time
+from decimal import Decimal
+
+import msgpack
+import orjson
+from rest_framework.renderers import BaseRenderer
+
+
+class ORJSONRenderer(BaseRenderer):
+    """JSON through orjson, which encodes dicts, lists and datetimes natively."""
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return orjson.dumps(data, default=_default)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Binary MessagePack, picked with `Accept: application/msgpack` or ?format=msgpack."""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_default)
+
+
+def _default(value):
+    """Types the encoders don't handle on their own: Decimals, and datetimes for msgpack."""
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
@@ -0,0 +1,133 @@
+import functools
+import gzip
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+GENERATION_KEY = 'api:generation'
+CACHEABLE_METHODS = ('GET', 'HEAD')
+
+
+def _cache():
+    return caches[getattr(settings, 'API_CACHE_ALIAS', 'default')]
+
+
+def current_generation():
+    """Counter every cache key includes; bumping it retires all cached responses at once."""
+    cache = _cache()
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, 1, timeout=None)
+        generation = cache.get(GENERATION_KEY, 1)
+    return generation
+
+
+def bump_generation():
+    """Called by the ingestion path once a scrape's writes are committed."""
+    cache = _cache()
+    try:
+        try:
+            cache.incr(GENERATION_KEY)
+        except ValueError:
+            cache.add(GENERATION_KEY, 2, timeout=None)
+    except RedisError:
+        pass  # Entries still expire after API_CACHE_TIMEOUT
+
+
+def _cache_key(request, generation, minute=''):
+    """Key for a request: path, its query parameters in a fixed order and the Accept header (JSON or msgpack)."""
+    query = urlencode(sorted((key, value) for key, values in request.GET.lists() for value in values))
+    accept = request.META.get('HTTP_ACCEPT', '')
+    digest = hashlib.sha1(f"{request.path}?{query}|{accept}|{minute}".encode('utf-8')).hexdigest()
+    return f"api:response:{generation}:{digest}"
+
+
+def _build_entry(response):
+    """Renders a response once and keeps it in every encoding a client may ask for."""
+    body = response.content
+    entry = {
+        'status': response.status_code,
+        'content_type': response['Content-Type'],
+        'identity': body,
+        'gzip': gzip.compress(body, compresslevel=6),
+    }
+    if brotli is not None:
+        entry['br'] = brotli.compress(body, quality=5)
+    return entry
+
+
+def _serve(request, entry, state):
+    accepted = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    encoding = next((name for name in ('br', 'gzip') if name in accepted and name in entry), None)
+    response = HttpResponse(entry[encoding or 'identity'], status=entry['status'], content_type=entry['content_type'])
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Vary'] = 'Accept, Accept-Encoding'
+    response['X-Cache'] = state
+    return response
+
+
+def cache_response(view=None, now_param=None, clock_param=None):
+    """Serves GET responses from the cache, skipping the ORM, DRF rendering and compression on a hit.
+
+    Responses are keyed by path, sorted query parameters, Accept and the
+    current generation, and are stored precompressed. Browsable-API (HTML)
+    requests and non-200 responses are never cached. When the view's
+    `now_param` is missing it defaults to the current time, so the current
+    minute joins the key and the entry expires with that minute. The same
+    happens whenever `clock_param` is given, for parameters counted from now.
+    """
+    if view is None:
+        return functools.partial(cache_response, now_param=now_param, clock_param=clock_param)
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (
+            not getattr(settings, 'API_CACHE_ENABLED', True)
+            or request.method not in CACHEABLE_METHODS
+            or 'text/html' in request.META.get('HTTP_ACCEPT', '')
+        ):
+            return view(request, *args, **kwargs)
+
+        cache = _cache()
+        timeout = getattr(settings, 'API_CACHE_TIMEOUT', 3600)
+        minute = ''
+        if (now_param and not request.GET.get(now_param)) or (clock_param and request.GET.get(clock_param)):
+            now = timezone.now()
+            minute = f"{now:%Y%m%d%H%M}"
+            timeout = min(timeout, 60 - now.second)
+        try:
+            key = _cache_key(request, current_generation(), minute)
+            entry = cache.get(key)
+        except RedisError:
+            return view(request, *args, **kwargs)
+        if entry is not None:
+            return _serve(request, entry, 'HIT')
+
+        response = view(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        if hasattr(response, 'render'):
+            response.render()
+
+        entry = _build_entry(response)
+        try:
+            cache.set(key, entry, timeout=timeout)
+        except RedisError:
+            pass
+        return _serve(request, entry, 'MISS')
+
+    return wrapper
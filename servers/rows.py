@@ -0,0 +1,61 @@
+from django.utils import timezone
+from rest_framework import serializers
+
+from servers.wipe_times import format_wipe_day, format_wipe_hour, next_occurrence
+
+# Fields a /servers row can have, in output order
+SERVER_FIELDS = ('server_id', 'server_name', 'max_group', 'wipe_schedules')
+SCHEDULE_COLUMNS = ('server_id', 'wipe_minute', 'wiped_at')
+
+# Formats wiped_at exactly like WipeScheduleSerializer does on the detail endpoint
+_datetime_field = serializers.DateTimeField()
+
+
+def parse_fields(value):
+    """Requested fields from a ?fields= value, all of them when it is empty. Raises ValueError on unknown names."""
+    if not value:
+        return SERVER_FIELDS
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in SERVER_FIELDS]
+    if unknown or not fields:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}" if unknown else "No fields given")
+    return tuple(field for field in SERVER_FIELDS if field in fields)
+
+
+def server_columns(fields):
+    """Columns to select for `fields`; server_id is always read because pages are ordered by it."""
+    return ['server_id'] + [field for field in fields if field in ('server_name', 'max_group')]
+
+
+def schedule_row(minute, wiped_at, now):
+    next_wipe = next_occurrence(minute, now)
+    return {
+        "wipe_minute": minute,
+        "wiped_at": _datetime_field.to_representation(wiped_at),
+        "day_name": format_wipe_day(next_wipe),
+        "wipe_hour": format_wipe_hour(next_wipe),
+    }
+
+
+def attach_schedules(rows, fields, schedules):
+    """Adds wipe_schedules to values() rows with one query when it was requested.
+
+    `schedules` is a WipeSchedule queryset, already narrowed and ordered as
+    the caller wants.
+    """
+    if 'wipe_schedules' in fields and rows:
+        by_server = {row['server_id']: [] for row in rows}
+        now = timezone.now()
+        for server_id, minute, wiped_at in schedules.filter(server_id__in=list(by_server)).values_list(*SCHEDULE_COLUMNS):
+            by_server[server_id].append(schedule_row(minute, wiped_at, now))
+        for row in rows:
+            row['wipe_schedules'] = by_server[row['server_id']]
+    return rows
+
+
+def drop_unrequested(rows, fields):
+    """Removes server_id when it was only read for ordering; call once pagination links are built."""
+    if 'server_id' not in fields:
+        for row in rows:
+            del row['server_id']
+    return rows
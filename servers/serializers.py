@@ -1,9 +1,17 @@
 from rest_framework import serializers
-from .models import Server  # Import the Server model
+from .models import Server, WipeSchedule  # Import the Server model
+
+
+class WipeScheduleSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = WipeSchedule
+        fields = ['wipe_minute', 'wiped_at', 'day_name', 'wipe_hour']  # day_name/wipe_hour are derived
 
 
 class ServerSerializer(serializers.ModelSerializer):
+    # Read from the prefetch cache set up by ServerViewSet, never one query per server
+    wipe_schedules = WipeScheduleSerializer(many=True, read_only=True)
+
     class Meta:
         model = Server  # The model to serialize
-        fields = ['server_id', 'server_name', 'wipe_time', 'max_group']  # The fields to include in the serialization
-
+        fields = ['server_id', 'server_name', 'max_group', 'wipe_schedules']  # The fields to include in the serialization
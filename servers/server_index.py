@@ -0,0 +1,69 @@
+from array import array
+from bisect import bisect_left, insort
+
+from django.conf import settings
+
+from servers.models import Server
+
+# Server IDs streamed per round trip while loading the index
+LOAD_CHUNK_SIZE = 5000
+
+
+class ServerIdIndex:
+    """Run-scoped set of known server IDs, so page parsing never queries the table.
+
+    The index is loaded once per run. Server IDs come from the sources, not
+    from an auto-increment, so a new server can sort anywhere and there is
+    no cheap top-up query; IDs written by the current run are added by the
+    ingestion path as rows are inserted. With
+    `compact` the IDs are kept in a sorted array('q') (8 bytes per ID)
+    instead of a set.
+    """
+
+    def __init__(self, compact=False):
+        self.compact = compact
+        self._ids = array('q') if compact else set()
+
+    @classmethod
+    def load(cls, compact=None):
+        """Builds an index of every server currently in the database."""
+        if compact is None:
+            compact = getattr(settings, 'SERVER_INDEX_COMPACT', False)
+        index = cls(compact=compact)
+        index.add_many(
+            Server.objects.order_by('server_id')
+            .values_list('server_id', flat=True)
+            .iterator(chunk_size=LOAD_CHUNK_SIZE)
+        )
+        return index
+
+    def __contains__(self, server_id):
+        if not self.compact:
+            return server_id in self._ids
+        position = bisect_left(self._ids, server_id)
+        return position < len(self._ids) and self._ids[position] == server_id
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, server_id):
+        if server_id in self:
+            return
+        if self.compact:
+            insort(self._ids, server_id)
+        else:
+            self._ids.add(server_id)
+
+    def add_many(self, server_ids):
+        if not self.compact:
+            self._ids.update(server_ids)
+            return
+
+        incoming = sorted(set(server_ids))
+        if not incoming:
+            return
+        if not self._ids or incoming[0] > self._ids[-1]:
+            # The common case when loading in ID order: append without re-sorting
+            self._ids.extend(incoming)
+        else:
+            self._ids = array('q', sorted(set(self._ids).union(incoming)))
@@ -0,0 +1,248 @@
+import functools
+
+from celery import chord, shared_task
+from celery.utils.log import get_task_logger
+from django.conf import settings
+from django.utils import timezone
+
+from servers.coordinator import IngestionCoordinator
+from servers.extraction import extract_battlemetrics, extract_just_wiped
+from servers.http_cache import NOT_MODIFIED, get_http_cache
+from servers.ingestion import ingest_servers
+from servers.management.commands.fetch_api_servers import (
+    DEFAULT_SHARD_BOUNDS,
+    Command as FetchApiServersCommand,
+    crawl_shard,
+    player_count_shards,
+)
+from servers.management.commands.recent_wipes import Command as RecentWipesCommand
+from servers.management.commands.scrape_battlemetrics import Command as ScrapeBattlemetricsCommand
+from servers.management.commands.upcoming_wipes import Command as UpcomingWipesCommand
+from servers.partitions import partition_name, rotate_partitions
+from servers.server_index import ServerIdIndex
+from servers.webdriver_pool import get_driver_pool
+
+logger = get_task_logger(__name__)
+
+
+def get_server_index():
+    """Server ID index for one task, reloaded in full so it sees servers other workers inserted."""
+    return ServerIdIndex.load()
+
+
+def fan_out(page_task, args_list, source):
+    """Runs one page task per argument tuple as a group, then ingests every page once."""
+    header = [page_task.s(*args) for args in args_list]
+    return chord(header)(ingest_pages.s(source))
+
+
+def empty_on_error(page_task):
+    """Makes a chord header task return an empty page instead of raising.
+
+    A failed header task keeps the chord callback from running, which
+    would drop the pages of every other task in the run.
+    """
+    @functools.wraps(page_task)
+    def wrapper(*args, **kwargs):
+        try:
+            return page_task(*args, **kwargs)
+        except Exception:
+            logger.exception("%s%r failed, its page is left out of the run", page_task.__name__, args)
+            return page_result([])
+    return wrapper
+
+
+def page_result(servers_data, url=None, http_cache=None):
+    """What a page task hands its chord callback.
+
+    The HTTP validators travel with the servers; the callback persists
+    them only after the write, so a failed write refetches the page.
+    """
+    validators = http_cache.take(url) if http_cache else None
+    return {'servers': servers_data, 'url': url, 'validators': validators}
+
+
+def page_servers(page):
+    return page['servers'] if page else []
+
+
+def commit_validators(pages):
+    http_cache = get_http_cache()
+    if http_cache:
+        for page in pages:
+            if page and page['validators']:
+                http_cache.store(page['url'], page['validators'])
+
+
+@shared_task
+def ingest_pages(pages, source):
+    """Chord callback: merges the pages of one source and writes them in a single batch."""
+    servers_data = [server for page in pages for server in page_servers(page)]
+    result = ingest_servers(servers_data, get_server_index(), source=source)
+    commit_validators(pages)
+    logger.info("%s: %d servers from %d pages, %s", source, len(servers_data), len(pages), result)
+    return {
+        'source': source,
+        'inserted': result.inserted,
+        'updated': result.updated,
+        'skipped': result.skipped,
+        'schedules_added': result.schedules_added,
+    }
+
+
+@shared_task
+@empty_on_error
+def scrape_recent_wipes_page(url):
+    """Fetches and parses one Just-Wiped listing page."""
+    command = RecentWipesCommand()
+    command.server_index = get_server_index()
+    command.http_cache = get_http_cache()
+    html = command.fetch_data(url)
+    if not html or html is NOT_MODIFIED:
+        return page_result([])
+    return page_result(command.build_servers_data(extract_just_wiped(html).records), url, command.http_cache)
+
+
+@shared_task
+@empty_on_error
+def scrape_battlemetrics_page(url):
+    """Fetches and parses one BattleMetrics listing page with the worker's driver pool."""
+    command = ScrapeBattlemetricsCommand()
+    command.server_index = get_server_index()
+    command.driver_pool = get_driver_pool()
+    command.fast_load = command.driver_pool.block_resources
+    command.load_timeout = getattr(settings, 'SCRAPER_LOAD_TIMEOUT', 15)
+    command.first_row_timings = []
+    html = command.fetch_data(url)
+    if not html:
+        return page_result([])
+    return page_result(command.build_servers_data(extract_battlemetrics(html).records))
+
+
+@shared_task
+@empty_on_error
+def scrape_upcoming_wipes_page(url):
+    """Fetches and parses the upcoming wipes listing."""
+    command = UpcomingWipesCommand()
+    command.server_index = get_server_index()
+    command.http_cache = get_http_cache()
+    html = command.fetch_data(url)
+    if not html or html is NOT_MODIFIED:
+        return page_result([])
+    return page_result(command.parse_html(html), url, command.http_cache)
+
+
+def recent_wipes_args():
+    command = RecentWipesCommand()
+    return [(url,) for url, _ in command.iter_pages()]
+
+
+def battlemetrics_args():
+    command = ScrapeBattlemetricsCommand()
+    return [(command.get_paginated_url(page),) for page in range(1, command.max_pages + 1)]
+
+
+def api_shard_args():
+    """Arguments of every API shard task, or an empty list without an API key."""
+    command = FetchApiServersCommand()
+    if not command.battlemetrics_api_key:
+        return []
+    bounds = getattr(settings, 'BATTLEMETRICS_API_SHARD_BOUNDS', DEFAULT_SHARD_BOUNDS)
+    max_pages = getattr(settings, 'BATTLEMETRICS_API_MAX_PAGES', None)
+    shards = player_count_shards(bounds, command.get_query_params())
+    return [(label, params, max_pages) for label, params in shards]
+
+
+def upcoming_wipes_args():
+    return [(UpcomingWipesCommand().get_url(),)]
+
+
+@shared_task
+def scrape_recent_wipes():
+    return fan_out(scrape_recent_wipes_page, recent_wipes_args(), 'recent_wipes').id
+
+
+@shared_task
+def scrape_battlemetrics():
+    return fan_out(scrape_battlemetrics_page, battlemetrics_args(), 'scrape_battlemetrics').id
+
+
+@shared_task
+@empty_on_error
+def crawl_api_shard(label, params, max_pages=None):
+    """Follows the API cursor chain of one player-count shard."""
+    label, servers_data, pages, seconds = crawl_shard(label, params, max_pages)
+    logger.info("API shard %s: %d servers, %d pages in %.1fs", label, len(servers_data), pages, seconds)
+    return page_result(servers_data)
+
+
+@shared_task
+def fetch_api_servers():
+    """Crawls the API as independent player-count shards, one task each, then writes once."""
+    args_list = api_shard_args()
+    if not args_list:
+        return None
+    return fan_out(crawl_api_shard, args_list, 'fetch_api_servers').id
+
+
+@shared_task
+def scrape_upcoming_wipes():
+    return fan_out(scrape_upcoming_wipes_page, upcoming_wipes_args(), 'upcoming_wipes').id
+
+
+@shared_task
+def ingest_run(pages, sources):
+    """Chord callback of scrape_all_sources: merges every page by source priority and writes once."""
+    coordinator = IngestionCoordinator()
+    for source, page in zip(sources, pages):
+        coordinator.add(source, page_servers(page))
+    logger.info("Run: %s", coordinator.summary())
+    result = coordinator.write(get_server_index())
+    commit_validators(pages)
+    logger.info("Run written: %s", result)
+    return {
+        'servers': result.inserted + result.updated + result.skipped,
+        'duplicates': coordinator.duplicates,
+        'inserted': result.inserted,
+        'updated': result.updated,
+        'skipped': result.skipped,
+        'schedules_added': result.schedules_added,
+    }
+
+
+@shared_task
+def scrape_all_sources():
+    """Fans out the pages of every source as one chord whose callback does the run's only write."""
+    header = []
+    sources = []
+    for source, page_task, args_list in (
+        ('recent_wipes', scrape_recent_wipes_page, recent_wipes_args()),
+        ('upcoming_wipes', scrape_upcoming_wipes_page, upcoming_wipes_args()),
+        ('fetch_api_servers', crawl_api_shard, api_shard_args()),
+        ('scrape_battlemetrics', scrape_battlemetrics_page, battlemetrics_args()),
+    ):
+        header.extend(page_task.s(*args) for args in args_list)
+        sources.extend([source] * len(args_list))
+    # Chord results come back in header order, so sources[i] labels pages[i]
+    return chord(header)(ingest_run.s(sources)).id
+
+
+@shared_task
+def scrape_and_store_server_data():
+    """Periodic entry point registered by setup_periodic_task: one merged write for every source."""
+    return scrape_all_sources.delay().id
+
+
+@shared_task
+def rotate_wipe_event_partitions():
+    """Keeps weekly wipe_events partitions ahead of the clock and drops expired ones."""
+    added, dropped = rotate_partitions(
+        timezone.now().date(),
+        getattr(settings, 'WIPE_EVENT_PARTITIONS_AHEAD', 4),
+        getattr(settings, 'WIPE_EVENT_RETENTION_WEEKS', 52),
+    )
+    logger.info(
+        "wipe_events partitions: added %s, dropped %s",
+        [partition_name(week) for week in added], [partition_name(week) for week in dropped]
+    )
+    return {'added': len(added), 'dropped': len(dropped)}
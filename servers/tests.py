@@ -1,3 +1,443 @@
-from django.test import TestCase
+import importlib
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from servers.coordinator import IngestionCoordinator
+from servers.extraction import ServerRecord, extract_battlemetrics, extract_just_wiped, stream_just_wiped
+from servers.ingestion import ingest_servers
+from servers.json_stream import JsonArrayStream
+from servers.management.commands.fetch_api_servers import Command as FetchApiServersCommand
+from servers.models import Server, ServerFingerprint, WipeEvent, WipeSchedule
+from servers.rate_limit import RATE_STEP, BaseRateLimiter, LocalRateLimiter
+from servers.response_cache import bump_generation, current_generation
+from servers.server_index import ServerIdIndex
+from servers.upcoming import UpcomingIndex, next_wipes, next_wipes_from_db
+from servers.wipe_times import schedule_minute
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'}}
+
+
+@override_settings(API_CACHE_ENABLED=False)
+class ServerListQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Server.objects.bulk_create([
+            Server(server_id=server_id, server_name=f"Server {server_id}", max_group=server_id % 4 or None)
+            for server_id in range(1, 31)
+        ])
+        wiped_at = datetime(2025, 3, 13, 21, 0, tzinfo=dt_timezone.utc)
+        WipeSchedule.objects.bulk_create([
+            WipeSchedule(server_id=server_id, wipe_minute=(schedule_minute(wiped_at) + hours * 60) % 10080, wiped_at=wiped_at)
+            for server_id in range(1, 31)
+            for hours in (0, 24, 48)
+        ])
+
+    def test_query_count_is_fixed_per_page(self):
+        # One query for the page of servers, one for all of their schedules
+        for page_size in (5, 30):
+            with self.assertNumQueries(2):
+                response = self.client.get('/servers/', {'page_size': page_size})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['results']), page_size)
+            self.assertTrue(all(len(server['wipe_schedules']) == 3 for server in response.data['results']))
+
+    def test_filtered_list_query_count(self):
+        # Filters are in the display zone, whose offset depends on today's date
+        schedule = WipeSchedule.objects.filter(server_id=1).order_by('wipe_minute').first()
+        params = {'wipe_day': schedule.day_name, 'wipe_hour': schedule.wipe_hour, 'page_size': 30}
+        with self.assertNumQueries(2):
+            response = self.client.get('/servers/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 30)
+
+    def test_sparse_fields_skip_the_schedule_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/servers/', {'fields': 'server_name', 'page_size': 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.data['results'][0]), ['server_name'])
+        self.assertIsNotNone(response.data['next'])
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get('/servers/', {'fields': 'server_name,password'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_upcoming_hours_must_be_finite(self):
+        for value in ('1e400', 'inf', 'nan', '-1', 'soon'):
+            response = self.client.get('/servers/', {'upcoming_hours': value})
+            self.assertEqual(response.status_code, 400, value)
+        self.assertEqual(self.client.get('/servers/', {'upcoming_hours': '1000'}).status_code, 200)
+
+    def test_list_and_detail_render_schedules_alike(self):
+        listed = self.client.get('/servers/', {'page_size': 1}).json()['results'][0]
+        detail = self.client.get(f"/servers/{listed['server_id']}/").json()
+        self.assertEqual(listed, detail)
+        self.assertTrue(listed['wipe_schedules'][0]['wiped_at'].endswith('Z'))
+
+    def test_schedules_carry_derived_display_fields(self):
+        response = self.client.get('/servers/1/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('day_name', response.data['wipe_schedules'][0])
+        self.assertIn('wipe_hour', response.data['wipe_schedules'][0])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, API_CACHE_ENABLED=True)
+class ResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Server.objects.create(server_id=1, server_name="Server 1", max_group=2)
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def test_hit_skips_the_database(self):
+        first = self.client.get('/servers/', {'max_group': 2}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(first['Content-Encoding'], 'gzip')
+        with self.assertNumQueries(0):
+            second = self.client.get('/servers/', {'max_group': 2}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.content, first.content)
+
+    def test_ingestion_retires_cached_responses(self):
+        self.client.get('/servers/1/')
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_servers([{"server_id": 1, "server_name": "Renamed", "max_group": 2, "is_existing": True}])
+        response = self.client.get('/servers/1/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['server_name'], "Renamed")
+
+    def test_upcoming_hours_follows_the_clock(self):
+        thursday = datetime(2025, 3, 13, 19, 0, tzinfo=dt_timezone.utc)
+        WipeSchedule.objects.create(server_id=1, wipe_minute=schedule_minute(thursday), wiped_at=thursday)
+        with mock.patch('django.utils.timezone.now', return_value=thursday - timedelta(minutes=90)):
+            early = self.client.get('/servers/1/', {'upcoming_hours': 1})
+        with mock.patch('django.utils.timezone.now', return_value=thursday - timedelta(minutes=30)):
+            late = self.client.get('/servers/1/', {'upcoming_hours': 1})
+        self.assertEqual(early.json()['wipe_schedules'], [])
+        self.assertEqual(late['X-Cache'], 'MISS')
+        self.assertEqual(len(late.json()['wipe_schedules']), 1)
+
+
+class IngestionFingerprintTests(TestCase):
+    def scrape(self, server_name="Server 1"):
+        wiped_at = datetime(2025, 3, 13, 21, 0, tzinfo=dt_timezone.utc)
+        return [{"server_id": 1, "server_name": server_name, "max_group": 2, "wiped_at": wiped_at, "is_existing": False}]
+
+    def test_unchanged_scrape_is_one_read(self):
+        ingest_servers(self.scrape())
+        with self.assertNumQueries(1):
+            result = ingest_servers(self.scrape())
+        self.assertEqual((result.inserted, result.updated, result.skipped), (0, 0, 1))
+
+    def test_changed_server_is_written(self):
+        ingest_servers(self.scrape())
+        result = ingest_servers(self.scrape("Renamed"))
+        self.assertEqual(result.updated, 1)
+        self.assertEqual(Server.objects.get(server_id=1).server_name, "Renamed")
+
+    def test_each_wipe_is_logged_once(self):
+        ingest_servers(self.scrape(), source='recent_wipes')
+        ingest_servers(self.scrape(), source='scrape_battlemetrics')
+        next_week = self.scrape()
+        next_week[0]["wiped_at"] += timedelta(weeks=1)
+        ingest_servers(next_week, source='recent_wipes')
+        self.assertEqual(
+            list(WipeEvent.objects.order_by('wiped_at').values_list('source', flat=True)),
+            ['recent_wipes', 'recent_wipes']
+        )
+        self.assertEqual(WipeSchedule.objects.filter(server_id=1).count(), 1)
+
+    def test_announced_wipe_is_not_logged(self):
+        upcoming = self.scrape()
+        upcoming[0]["wiped_at"] = timezone.now() + timedelta(days=2)
+        ingest_servers(upcoming, source='upcoming_wipes')
+        self.assertFalse(WipeEvent.objects.exists())
+        self.assertIsNone(ServerFingerprint.objects.get(server_id=1).last_wiped_at)
+        self.assertEqual(WipeSchedule.objects.filter(server_id=1).count(), 1)
+
+    def test_dry_run_writes_nothing(self):
+        result = ingest_servers(self.scrape(), dry_run=True)
+        self.assertEqual(result.inserted, 1)
+        self.assertEqual(result.changes[0][2][0], "new server")
+        self.assertFalse(Server.objects.exists())
+        self.assertFalse(ServerFingerprint.objects.exists())
+        self.assertFalse(WipeEvent.objects.exists())
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CompactWipeSchedulesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        monday = datetime(2025, 3, 10, tzinfo=dt_timezone.utc)
+        Server.objects.bulk_create([Server(server_id=1, server_name="Minted"), Server(server_id=2, server_name="Daily")])
+        # Server 1: run times with microseconds from the old now() fallback, one slot confirmed by an event
+        minted = [monday + timedelta(hours=hour, minutes=15, microseconds=123457) for hour in range(10)]
+        # Server 2: a real wipe every day, whole seconds as the sources report them
+        daily = [monday + timedelta(days=day, hours=19, seconds=12) for day in range(7)]
+        WipeSchedule.objects.bulk_create(
+            [WipeSchedule(server_id=1, wipe_minute=schedule_minute(at), wiped_at=at) for at in minted]
+            + [WipeSchedule(server_id=2, wipe_minute=schedule_minute(at), wiped_at=at) for at in daily]
+        )
+        WipeEvent.objects.create(server_id=1, wiped_at=minted[3] + timedelta(weeks=1), source='recent_wipes')
+        cls.confirmed_minute = schedule_minute(minted[3])
+
+        # Servers 3 and 4: rows converted by migration 0002, which left wiped_at empty
+        legacy_wipe_minute = importlib.import_module('servers.migrations.0002_wipeschedule_wipe_minute').legacy_wipe_minute
+        Server.objects.bulk_create([Server(server_id=3, server_name="Legacy"), Server(server_id=4, server_name="Unobserved")])
+        legacy = [('Thursday', '2pm est'), ('Monday', '9am est'), ('Saturday', '11pm est')]
+        WipeSchedule.objects.bulk_create([
+            WipeSchedule(server_id=server_id, wipe_minute=legacy_wipe_minute(day_name, wipe_hour), wiped_at=None)
+            for server_id in (3, 4)
+            for day_name, wipe_hour in legacy
+        ])
+        # Server 3's real Thursday wipe, logged two weeks running
+        WipeEvent.objects.bulk_create([
+            WipeEvent(server_id=3, wiped_at=datetime(2025, 3, 13, 19, 0, 4, tzinfo=dt_timezone.utc) + timedelta(weeks=week), source='fetch_api_servers')
+            for week in (0, 1)
+        ])
+        cls.legacy_minute = legacy_wipe_minute('Thursday', '2pm est')
+
+    def compact(self, *args):
+        call_command('compact_wipe_schedules', '--chunk-size', '1', '--sleep', '0', '--restart', *args, stdout=StringIO())
+
+    def test_minted_schedules_are_deleted(self):
+        self.compact()
+        self.assertEqual(
+            list(WipeSchedule.objects.filter(server_id=1).values_list('wipe_minute', flat=True)),
+            [self.confirmed_minute]
+        )
+
+    def test_legitimate_multi_slot_server_is_kept(self):
+        self.compact()
+        self.assertEqual(WipeSchedule.objects.filter(server_id=2).count(), 7)
+
+    def test_unconfirmed_legacy_schedules_are_deleted(self):
+        self.compact()
+        self.assertEqual(
+            list(WipeSchedule.objects.filter(server_id=3).values_list('wipe_minute', flat=True)),
+            [self.legacy_minute]
+        )
+
+    def test_legacy_schedules_without_logged_wipes_are_kept(self):
+        self.compact()
+        self.assertEqual(WipeSchedule.objects.filter(server_id=4).count(), 3)
+
+    def test_legacy_schedules_need_enough_observed_weeks(self):
+        self.compact('--confirm-weeks', '3')
+        self.assertEqual(WipeSchedule.objects.filter(server_id=3).count(), 3)
+
+    def test_dry_run_deletes_nothing(self):
+        self.compact('--dry-run')
+        self.assertEqual(WipeSchedule.objects.count(), 23)
+
+
+class ServerIdIndexTests(TestCase):
+    def test_load_sees_ids_below_the_highest(self):
+        Server.objects.bulk_create([Server(server_id=900, server_name="High"), Server(server_id=10, server_name="Low")])
+        for compact in (False, True):
+            index = ServerIdIndex.load(compact=compact)
+            index.add(5)
+            self.assertEqual([server_id in index for server_id in (5, 10, 11, 900)], [True, True, False, True])
+
+
+class IngestionCoordinatorTests(TestCase):
+    def test_every_source_keeps_its_slot(self):
+        thursday = datetime(2025, 3, 13, 19, 0, tzinfo=dt_timezone.utc)
+        monday = datetime(2025, 3, 10, 15, 0, tzinfo=dt_timezone.utc)
+        coordinator = IngestionCoordinator(['fetch_api_servers', 'recent_wipes'])
+        coordinator.add('recent_wipes', [{"server_id": 1, "server_name": "Scraped", "max_group": None, "wiped_at": monday}])
+        coordinator.add('fetch_api_servers', [{"server_id": 1, "server_name": "API", "max_group": 2, "wiped_at": thursday}])
+        coordinator.write()
+
+        server = Server.objects.get(server_id=1)
+        self.assertEqual((server.server_name, server.max_group), ("API", 2))
+        self.assertEqual(
+            sorted(WipeSchedule.objects.filter(server_id=1).values_list('wipe_minute', flat=True)),
+            sorted([schedule_minute(monday), schedule_minute(thursday)])
+        )
+
+
+class UpcomingIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Server.objects.bulk_create([
+            Server(server_id=server_id, server_name=f"Server {server_id}", max_group=server_id % 3 or None)
+            for server_id in range(1, 13)
+        ])
+        # Slots spread over the week, several on Sunday night and Monday morning
+        minutes = [0, 60, 60, 1440, 4 * 1440 + 19 * 60, 6 * 1440 + 22 * 60, 6 * 1440 + 23 * 60, 6 * 1440 + 23 * 60]
+        WipeSchedule.objects.bulk_create([
+            WipeSchedule(server_id=server_id, wipe_minute=minutes[(server_id + offset) % len(minutes)])
+            for server_id in range(1, 13)
+            for offset in (0, 3)
+        ])
+
+    def setUp(self):
+        self.index = UpcomingIndex()
+        self.index.rebuild()
+
+    def assertMatchesDatabase(self, after, limit, max_group=None):
+        self.assertEqual(
+            self.index.next_wipes(after, limit, max_group),
+            next_wipes_from_db(after, limit, max_group)
+        )
+
+    def test_wraps_from_sunday_into_monday(self):
+        sunday_night = datetime(2025, 3, 16, 22, 30, tzinfo=dt_timezone.utc)
+        wipes = self.index.next_wipes(sunday_night, 10)
+        self.assertEqual([wipe["wipe_minute"] for wipe in wipes[:2]], [6 * 1440 + 23 * 60] * 2)
+        self.assertEqual(wipes[-1]["wipe_minute"], 60)
+        self.assertTrue(all(wipe["next_wipe"] >= sunday_night for wipe in wipes))
+        self.assertMatchesDatabase(sunday_night, 10)
+
+    def test_matches_database_for_groups_and_limits(self):
+        for after in (
+            datetime(2025, 3, 10, 0, 0, tzinfo=dt_timezone.utc),
+            datetime(2025, 3, 13, 20, 0, tzinfo=dt_timezone.utc),
+            datetime(2025, 3, 16, 23, 30, tzinfo=dt_timezone.utc),
+        ):
+            for max_group in (None, 1, 2):
+                for limit in (1, 5, 100):
+                    self.assertMatchesDatabase(after, limit, max_group)
+
+    def test_limit_never_repeats_a_slot(self):
+        wipes = self.index.next_wipes(datetime(2025, 3, 12, tzinfo=dt_timezone.utc), 100)
+        self.assertEqual(len(wipes), WipeSchedule.objects.count())
+
+    def test_refresh_adds_new_schedules(self):
+        WipeSchedule.objects.create(server_id=1, wipe_minute=3 * 1440)
+        self.assertEqual(self.index.refresh(), 1)
+        self.assertMatchesDatabase(datetime(2025, 3, 13, 0, 0, tzinfo=dt_timezone.utc), 5)
+
+    @override_settings(CACHES=LOCMEM_CACHES)
+    def test_stale_index_is_not_served(self):
+        self.index.rebuild(current_generation())
+        WipeSchedule.objects.create(server_id=1, wipe_minute=3 * 1440)
+        bump_generation()
+        after = datetime(2025, 3, 13, 0, 0, tzinfo=dt_timezone.utc)
+        # The background update hasn't caught up yet
+        with mock.patch('servers.upcoming._shared_index', self.index), \
+                mock.patch.object(UpcomingIndex, 'update_in_background'):
+            self.assertEqual(next_wipes(after, 5), next_wipes_from_db(after, 5))
+
+    @override_settings(API_CACHE_ENABLED=False)
+    def test_impossible_after_date_is_rejected(self):
+        response = self.client.get('/upcoming', {'after': '2025-02-30T10:00'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ApiPageTests(SimpleTestCase):
+    def test_sparse_fieldset_page_is_extracted(self):
+        # What the API sends for fields[server]=name,details: the ID sits outside attributes
+        page = json.dumps({
+            "data": [
+                {"type": "server", "id": "101", "attributes": {
+                    "name": "EU Solo Only", "details": {"rust_last_wipe": "2025-03-13T19:00:00.000Z"}
+                }},
+                {"type": "server", "id": "102", "attributes": {"name": "Vanilla Trio", "details": {}}},
+            ],
+            "links": {"next": "https://api.battlemetrics.com/servers?page[key]=2"},
+        }).encode('utf-8')
+        command = FetchApiServersCommand()
+        command.stdout = StringIO()
+        command.server_index = {102}
+        stream = JsonArrayStream((page[start:start + 7] for start in range(0, len(page), 7)), 'data')
+
+        servers = [command.extract_server_info(server) for server in stream]
+
+        self.assertEqual(servers, [
+            {"server_id": 101, "server_name": "EU Solo Only", "max_group": 1, "is_existing": False,
+             "wiped_at": datetime(2025, 3, 13, 19, 0, tzinfo=dt_timezone.utc)},
+            {"server_id": 102, "server_name": "Vanilla Trio", "max_group": 3, "is_existing": True, "wiped_at": None},
+        ])
+        self.assertEqual(stream.document["links"]["next"], "https://api.battlemetrics.com/servers?page[key]=2")
+
+
+class ExtractionTests(SimpleTestCase):
+    just_wiped_page = """<html><body><div class="servers">
+    <div class="server">
+        <a title="Open the server details page" href="/server/101/">R\u00fcst &amp; Co Duo Monthly</a>
+        <div class="sinfo i-max-group"><div class="value">5</div></div>
+        <div class="sinfo i-rating"><div class="value">87%</div></div>
+        <time class="timeago" datetime="2025-03-13T19:00:04Z">2 hours ago</time>
+    </div>
+    <div class="server">
+        <a title="Open the server details page" href="/server/102">Vanilla Weekly</a>
+        <div class="sinfo i-max-group"><div class="value"><div class="icon"></div>3</div></div>
+        <div class="sinfo i-rating"><div class="value"><div class="value">42%</div></div></div>
+    </div>
+    <div class="server">
+        <a title="Open the server details page" href="/server/not-an-id">Broken link</a>
+    </div>
+    <div class="server"><div class="sinfo i-rating"><div class="value">12</div></div></div>
+</div></body></html>"""
+
+    def test_stream_matches_document_parse(self):
+        expected = extract_just_wiped(self.just_wiped_page, backend='html.parser').records
+        self.assertEqual(expected, [
+            ServerRecord(101, "R\u00fcst & Co Duo Monthly", 2, 87, datetime(2025, 3, 13, 19, 0, 4, tzinfo=dt_timezone.utc)),
+            ServerRecord(102, "Vanilla Weekly", 3, 42, None),
+        ])
+        page = self.just_wiped_page.encode('utf-8')
+        for chunk_size in range(1, 10001):
+            chunks = [page[start:start + chunk_size] for start in range(0, len(page), chunk_size)]
+            self.assertEqual(list(stream_just_wiped(chunks)), expected, chunk_size)
+
+    def test_battlemetrics_wipe_times(self):
+        store = json.dumps({"servers": {"list": [
+            {"type": "server", "id": "201", "attributes": {"details": {"rust_last_wipe": "2025-03-13T19:00:04.000Z"}}},
+            {"type": "server", "id": "203", "attributes": {"details": {"rust_born": "2025-03-06T18:00:00Z"}}},
+        ]}})
+        page = f"""<html><body>
+        <script id="storeBootstrap" type="application/json">{store}</script>
+        <table><tr>
+            <td class="css-1su1bxu"><a href="/servers/rust/201">Main Trio</a></td>
+            <td class="css-1su1bxu"><a href="/servers/rust/202">Solo Only</a><time datetime="2025-03-12T17:00:00Z">1 day</time></td>
+            <td class="css-1su1bxu"><a href="/servers/rust/203">Long Name</a></td>
+            <td class="css-1su1bxu"><a href="/servers/rust/204">No Time</a></td>
+            <td class="css-1su1bxu">No link</td>
+        </tr></table></body></html>"""
+        extracted = extract_battlemetrics(page, backend='html.parser')
+        self.assertTrue(extracted.has_servers)
+        self.assertEqual(extracted.records, [
+            ServerRecord(201, "Main Trio", 3, None, datetime(2025, 3, 13, 19, 0, 4, tzinfo=dt_timezone.utc)),
+            ServerRecord(202, "Solo Only", 1, None, datetime(2025, 3, 12, 17, 0, tzinfo=dt_timezone.utc)),
+            ServerRecord(203, "Long Name", None, None, datetime(2025, 3, 6, 18, 0, tzinfo=dt_timezone.utc)),
+            ServerRecord(204, "No Time", None, None, None),
+        ])
+
+
+@override_settings(SCRAPER_RATE_LIMITS={'example.com': 2.0})
+class RateLimiterTests(SimpleTestCase):
+    def setUp(self):
+        self.limiter = LocalRateLimiter()
+        self.limiter.reserve('example.com')
+
+    def rate(self):
+        return self.limiter._buckets['example.com']['rate']
+
+    def test_base_class_is_abstract(self):
+        with self.assertRaises(TypeError):
+            BaseRateLimiter()
+
+    def test_successes_ramp_up(self):
+        for status_code in (200, 204, 304):
+            self.limiter.feedback('example.com', status_code)
+        self.assertAlmostEqual(self.rate(), 2.0 + 3 * RATE_STEP)
+
+    def test_errors_leave_the_rate_alone(self):
+        for status_code in (301, 404, 500, 502):
+            self.limiter.feedback('example.com', status_code)
+        self.assertEqual(self.rate(), 2.0)
+
+    def test_throttling_halves_the_rate(self):
+        self.limiter.feedback('example.com', 503, '30')
+        self.assertEqual(self.rate(), 1.0)
+        self.assertGreater(self.limiter.reserve('example.com'), 29)
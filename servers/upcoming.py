@@ -0,0 +1,221 @@
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+
+from django.conf import settings
+from django.db import connections
+from redis.exceptions import RedisError
+
+from servers.models import WipeSchedule
+from servers.response_cache import current_generation
+from servers.wipe_times import format_wipe_day, format_wipe_hour, minute_of_week, next_occurrence
+
+logger = logging.getLogger(__name__)
+
+# Schedules streamed per round trip while building the index
+LOAD_CHUNK_SIZE = 5000
+
+_shared_index = None
+_shared_index_lock = threading.Lock()
+
+
+class _Slots:
+    """Weekly slots of one group as parallel arrays sorted by wipe_minute."""
+
+    __slots__ = ('minutes', 'server_ids')
+
+    def __init__(self, pairs=()):
+        pairs = sorted(pairs)
+        self.minutes = array('H', (minute for minute, _ in pairs))
+        self.server_ids = array('q', (server_id for _, server_id in pairs))
+
+    def __len__(self):
+        return len(self.minutes)
+
+    def insert(self, minute, server_id):
+        position = bisect_right(self.minutes, minute)
+        self.minutes.insert(position, minute)
+        self.server_ids.insert(position, server_id)
+
+    def following(self, minute, limit):
+        """Up to `limit` (minute, server_id) pairs from `minute` on, wrapping into next week."""
+        count = len(self.minutes)
+        start = bisect_left(self.minutes, minute)
+        positions = ((start + offset) % count for offset in range(min(limit, count)))
+        return [(self.minutes[position], self.server_ids[position]) for position in positions]
+
+
+def _wipe(minute, server_id, server_name, max_group, after):
+    next_wipe = next_occurrence(minute, after)
+    return {
+        "server_id": server_id,
+        "server_name": server_name,
+        "max_group": max_group,
+        "wipe_minute": minute,
+        "next_wipe": next_wipe,
+        "day_name": format_wipe_day(next_wipe),
+        "wipe_hour": format_wipe_hour(next_wipe),
+    }
+
+
+def next_wipes_from_db(after, limit, max_group=None):
+    """Same result as UpcomingIndex.next_wipes() with at most two indexed queries, for a process without an index yet."""
+    schedules = WipeSchedule.objects.order_by('wipe_minute', 'server_id').values_list(
+        'wipe_minute', 'server_id', 'server__server_name', 'server__max_group'
+    )
+    if max_group is not None:
+        schedules = schedules.filter(server__max_group=max_group)
+    minute = minute_of_week(after)
+    rows = list(schedules.filter(wipe_minute__gte=minute)[:limit])
+    if len(rows) < limit:
+        # Wrap into next week
+        rows += list(schedules.filter(wipe_minute__lt=minute)[:limit - len(rows)])
+    return [_wipe(*row, after) for row in rows]
+
+
+class UpcomingIndex:
+    """Every wipe schedule in memory, sorted by minute of week, once overall and once per max_group.
+
+    A lookup is a bisect plus a slice, so it never touches the database.
+    refresh() adds schedules with an ID above the highest one loaded;
+    rebuild() reloads everything, which also picks up renamed servers,
+    changed group sizes and deleted schedules. Both read the database
+    before taking the lock, so lookups only wait for the final swap.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._updating = threading.Lock()  # Held by the one background update in flight
+        self._all = _Slots()
+        self._groups = {}
+        self._servers = {}  # server_id -> (server_name, max_group)
+        self.high_water = 0
+        self.generation = None
+        self.built_at = 0
+        self.refreshed_at = 0
+
+    @property
+    def ready(self):
+        return self.built_at > 0
+
+    def _rows(self, above_id):
+        return (
+            WipeSchedule.objects.filter(id__gt=above_id)
+            .order_by('id')
+            .values_list('id', 'wipe_minute', 'server_id', 'server__server_name', 'server__max_group')
+            .iterator(chunk_size=LOAD_CHUNK_SIZE)
+        )
+
+    def rebuild(self, generation=None):
+        """Reloads every schedule; `generation` is the cache generation read before loading."""
+        pairs = []
+        group_pairs = {}
+        servers = {}
+        high_water = 0
+        for schedule_id, minute, server_id, server_name, max_group in self._rows(0):
+            pairs.append((minute, server_id))
+            group_pairs.setdefault(max_group, []).append((minute, server_id))
+            servers[server_id] = (server_name, max_group)
+            high_water = max(high_water, schedule_id)
+
+        groups = {max_group: _Slots(group) for max_group, group in group_pairs.items()}
+        with self._lock:
+            self._all = _Slots(pairs)
+            self._groups = groups
+            self._servers = servers
+            self.high_water = high_water
+            self.generation = generation
+            self.built_at = self.refreshed_at = time.monotonic()
+
+    def update_in_background(self, update):
+        """Runs rebuild or refresh on a daemon thread unless an update is already running."""
+        if not self._updating.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                update()
+            except Exception:
+                logger.exception("Updating the upcoming wipes index failed")
+            finally:
+                connections.close_all()
+                self._updating.release()
+
+        threading.Thread(target=run, name='upcoming-index', daemon=True).start()
+
+    def refresh(self, generation=None):
+        """Inserts schedules written since the last load, returning how many were added."""
+        added = 0
+        rows = list(self._rows(self.high_water))
+        with self._lock:
+            for schedule_id, minute, server_id, server_name, max_group in rows:
+                if schedule_id <= self.high_water:
+                    continue
+                self._all.insert(minute, server_id)
+                self._groups.setdefault(max_group, _Slots()).insert(minute, server_id)
+                self._servers[server_id] = (server_name, max_group)
+                self.high_water = schedule_id
+                added += 1
+            self.generation = generation
+            self.refreshed_at = time.monotonic()
+        return added
+
+    def __len__(self):
+        return len(self._all)
+
+    def next_wipes(self, after, limit, max_group=None):
+        """The next `limit` wipes at or after `after`, soonest first."""
+        with self._lock:
+            slots = self._all if max_group is None else self._groups.get(max_group)
+            if not slots:
+                return []
+            following = slots.following(minute_of_week(after), limit)
+            servers = self._servers
+
+        return [
+            _wipe(minute, server_id, *servers.get(server_id, (None, None)), after)
+            for minute, server_id in following
+        ]
+
+
+def _generation():
+    try:
+        return current_generation()
+    except RedisError:
+        return None
+
+
+def get_upcoming_index(generation):
+    """Process-wide index, kept current by background updates so no request waits for one.
+
+    Ingestion bumps the API cache generation when it writes; a changed
+    `generation`, or UPCOMING_REFRESH_SECONDS without one, tops the index
+    up. It is reloaded every UPCOMING_REBUILD_SECONDS.
+    """
+    global _shared_index
+    with _shared_index_lock:
+        if _shared_index is None:
+            _shared_index = UpcomingIndex()
+        index = _shared_index
+
+    now = time.monotonic()
+    if not index.ready or now - index.built_at > getattr(settings, 'UPCOMING_REBUILD_SECONDS', 3600):
+        index.update_in_background(lambda: index.rebuild(generation))
+    elif generation != index.generation or now - index.refreshed_at > getattr(settings, 'UPCOMING_REFRESH_SECONDS', 60):
+        index.update_in_background(lambda: index.refresh(generation))
+    return index
+
+
+def next_wipes(after, limit, max_group=None):
+    """Upcoming wipes from the shared index, or from the database until it has caught up with the last write.
+
+    The response is cached under the current generation, so it must not
+    come from an index loaded before that generation's writes.
+    """
+    generation = _generation()
+    index = get_upcoming_index(generation)
+    if index.ready and index.generation == generation:
+        return index.next_wipes(after, limit, max_group)
+    return next_wipes_from_db(after, limit, max_group)
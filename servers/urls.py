@@ -13,5 +13,6 @@ router.register(r'servers', ServerViewSet)
 # Include the router URLs
 urlpatterns = [
     path('', include(router.urls)),  # Prefix the API paths with 'api/'
+    path('upcoming', views.upcoming),
     
 ]
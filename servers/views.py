@@ -1,7 +1,154 @@
-from servers.models import Server  # Import from servers.models, not base.models
+import math
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Prefetch, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from servers.ingestion import forget_fingerprints
+from servers.models import Server, WipeSchedule  # Import from servers.models, not base.models
+from servers.pagination import ServerCursorPagination
+from servers.renderers import MessagePackRenderer, ORJSONRenderer
+from servers.response_cache import bump_generation, cache_response
+from servers.rows import attach_schedules, drop_unrequested, parse_fields, server_columns
+from servers.upcoming import next_wipes
+from servers.wipe_times import display_day_ranges, display_hour_minutes, parse_display_day, parse_display_hour
 from .serializers import ServerSerializer
-from rest_framework import viewsets
+from rest_framework import status, viewsets
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.decorators import api_view
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+MAX_UPCOMING_HOURS = 7 * 24
 
 class ServerViewSet(viewsets.ModelViewSet):
     queryset = Server.objects.all()  # Query all servers
-    serializer_class = ServerSerializer  # Use the ServerSerializer
\ No newline at end of file
+    serializer_class = ServerSerializer  # Use the ServerSerializer
+    pagination_class = ServerCursorPagination
+    renderer_classes = [ORJSONRenderer, MessagePackRenderer, BrowsableAPIRenderer]
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        # Wrapped outside DRF so a cache hit never builds a request, queryset or renderer
+        return cache_response(super().as_view(actions, **initkwargs), clock_param='upcoming_hours')
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        transaction.on_commit(bump_generation)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        # An edit made here must not hide the next scrape's value behind an unchanged fingerprint
+        forget_fingerprints([serializer.instance.server_id])
+        transaction.on_commit(bump_generation)
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        transaction.on_commit(bump_generation)
+
+    def get_schedule_queryset(self):
+        """Schedules embedded in each server; ?upcoming_hours=N keeps the slots wiping in the next N hours."""
+        schedules = WipeSchedule.objects.order_by('wipe_minute')
+        if self.request.query_params.get('upcoming_hours'):
+            try:
+                hours = float(self.request.query_params['upcoming_hours'])
+            except ValueError:
+                hours = math.nan
+            if not 0 <= hours < math.inf:
+                raise ValidationError({'upcoming_hours': 'Must be a non-negative number.'})
+            # Slots repeat weekly, so a longer window can't match more of them. Whole minutes, as cached.
+            now = timezone.now().replace(second=0, microsecond=0)
+            schedules = schedules.wiping_within(hours=min(hours, MAX_UPCOMING_HOURS), now=now)
+        return schedules
+
+    def get_queryset(self):
+        """Applies ?max_group=, ?name= (prefix), ?wipe_day= and ?wipe_hour= (display zone, e.g. 4pm).
+
+        Outside of list(), schedules are loaded with one prefetch query.
+        """
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        if self.action != 'list':
+            queryset = queryset.prefetch_related(Prefetch('wipe_schedules', queryset=self.get_schedule_queryset()))
+
+        if params.get('max_group'):
+            try:
+                queryset = queryset.filter(max_group=int(params['max_group']))
+            except ValueError:
+                raise ValidationError({'max_group': 'Must be an integer.'})
+
+        if params.get('name'):
+            queryset = queryset.filter(server_name__istartswith=params['name'])
+
+        day = hour = None
+        if params.get('wipe_day'):
+            day = parse_display_day(params['wipe_day'])
+            if day is None:
+                raise ValidationError({'wipe_day': 'Must be a weekday name like Thursday.'})
+        if params.get('wipe_hour'):
+            hour = parse_display_hour(params['wipe_hour'])
+            if hour is None:
+                raise ValidationError({'wipe_hour': 'Must be an hour like 4pm or 16.'})
+
+        if day is not None or hour is not None:
+            # Slots are stored in UTC; the filters are in the display zone
+            now = timezone.now()
+            if hour is not None:
+                slot = Q(wipe_minute__in=display_hour_minutes(hour, now, day))
+            else:
+                slot = Q()
+                for low, high in display_day_ranges(day, now):
+                    slot |= Q(wipe_minute__gte=low, wipe_minute__lt=high)
+            matching = WipeSchedule.objects.filter(slot, server_id=OuterRef('pk'))
+            queryset = queryset.filter(Exists(matching))
+
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        """Builds pages from values() rows, so no model instance or field serializer is made per server.
+
+        ?fields= picks a subset of server_id, server_name, max_group and
+        wipe_schedules; schedules are one extra query per page.
+        """
+        try:
+            fields = parse_fields(request.query_params.get('fields'))
+        except ValueError as e:
+            raise ValidationError({'fields': str(e)})
+
+        queryset = self.filter_queryset(self.get_queryset()).values(*server_columns(fields))
+        rows = attach_schedules(self.paginate_queryset(queryset), fields, self.get_schedule_queryset())
+        # The cursor links read server_id from the rows, so it is dropped afterwards
+        response = self.get_paginated_response(rows)
+        drop_unrequested(rows, fields)
+        return response
+
+
+@cache_response(now_param='after')
+@api_view(['GET'])
+def upcoming(req):
+    """Next wipes across all servers after ?after= (default now), optionally only ?max_group=."""
+    # Whole minutes, so every response cached for the current minute is the same
+    after = timezone.now().replace(second=0, microsecond=0)
+    if req.query_params.get('after'):
+        try:
+            after = parse_datetime(req.query_params['after'])
+        except ValueError:
+            after = None  # Well formed but not a real date, like February 30th
+        if after is None:
+            return Response({'error': 'after must be an ISO 8601 datetime'}, status=status.HTTP_400_BAD_REQUEST)
+        if timezone.is_naive(after):
+            after = timezone.make_aware(after, dt_timezone.utc)
+
+    max_limit = getattr(settings, 'UPCOMING_MAX_LIMIT', 100)
+    try:
+        limit = min(int(req.query_params.get('limit', 20)), max_limit)
+        max_group = int(req.query_params['max_group']) if req.query_params.get('max_group') else None
+    except ValueError:
+        return Response({'error': 'limit and max_group must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    if limit < 1:
+        return Response({'error': 'limit must be at least 1'}, status=status.HTTP_400_BAD_REQUEST)
+
+    results = next_wipes(after, limit, max_group)
+    return Response({'after': after, 'results': results})
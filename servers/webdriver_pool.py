@@ -0,0 +1,190 @@
+import atexit
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_driver_path():
+    """Resolves the chromedriver binary once per process."""
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            _driver_path = ChromeDriverManager().install()
+        return _driver_path
+
+
+def default_chrome_options():
+    """Headless Chrome options used by the scrapers."""
+    options = webdriver.ChromeOptions()
+    options.add_argument('--headless')  # Run in headless mode (no browser UI)
+    options.add_argument('--disable-gpu')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--window-size=1920,1080')  # Set window size
+    options.add_argument('--disable-dev-shm-usage')  # Overcome limited resource problems
+    return options
+
+
+def fast_chrome_options():
+    """Headless Chrome options that return control as soon as the DOM is ready."""
+    options = default_chrome_options()
+    options.page_load_strategy = 'eager'  # Don't wait for images, fonts and async scripts
+    options.add_argument('--blink-settings=imagesEnabled=false')
+    return options
+
+
+# Heavy resources the scrapers never read, blocked through CDP network interception
+BLOCKED_URL_PATTERNS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.css',
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+    '*googlesyndication.com*', '*adservice.google.com*',
+]
+
+
+class PooledDriver:
+    """A Chrome instance owned by a DriverPool, with the number of pages it has served."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+
+
+class DriverPool:
+    """Keeps up to `size` headless Chrome instances alive and hands them out to callers.
+
+    Drivers are started lazily, recycled after `recycle_after` pages and
+    replaced whenever they crash or fail a health check. With
+    `block_resources` each new driver blocks BLOCKED_URL_PATTERNS via CDP.
+    """
+
+    def __init__(self, size=2, recycle_after=20, options_factory=default_chrome_options, block_resources=False):
+        self.size = max(1, size)
+        self.recycle_after = recycle_after
+        self.options_factory = options_factory
+        self.block_resources = block_resources
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._started = 0
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _start_driver(self):
+        driver = webdriver.Chrome(service=Service(get_driver_path()), options=self.options_factory())
+        if self.block_resources:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URL_PATTERNS})
+        return PooledDriver(driver)
+
+    def _quit(self, pooled):
+        try:
+            pooled.driver.quit()
+        except Exception:
+            pass
+        with self._lock:
+            self._started -= 1
+
+    def is_healthy(self, pooled):
+        """Cheap round trip to the browser to make sure it is still responsive."""
+        try:
+            pooled.driver.current_url
+            return True
+        except WebDriverException:
+            return False
+
+    def acquire(self, timeout=None):
+        """Returns an idle driver, starting a new one while the pool is below its size."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("Driver pool is closed")
+                can_start = self._started < self.size
+                if can_start:
+                    self._started += 1
+
+            if can_start:
+                try:
+                    return self._start_driver()
+                except Exception:
+                    with self._lock:
+                        self._started -= 1
+                    raise
+
+            if deadline is not None and time.monotonic() >= deadline:
+                raise queue.Empty
+
+            # Poll so that a slot freed by a recycled driver is noticed too
+            try:
+                return self._idle.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+    def release(self, pooled, broken=False):
+        """Returns a driver to the pool, or quits it when it is due for recycling."""
+        pooled.pages += 1
+        if broken or self._closed or pooled.pages >= self.recycle_after or not self.is_healthy(pooled):
+            self._quit(pooled)
+        else:
+            self._idle.put(pooled)
+
+    @contextmanager
+    def driver(self):
+        """Borrows a driver for the duration of the with-block."""
+        pooled = self.acquire()
+        broken = False
+        try:
+            yield pooled.driver
+        except WebDriverException:
+            broken = True
+            raise
+        finally:
+            self.release(pooled, broken=broken)
+
+    def close(self):
+        """Quits every idle driver; drivers still in use are quit when released."""
+        self._closed = True
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._quit(pooled)
+
+
+def get_driver_pool():
+    """Process-wide pool shared by the Celery tasks of a worker."""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            fast_load = getattr(settings, 'SCRAPER_FAST_LOAD', True)
+            _shared_pool = DriverPool(
+                size=getattr(settings, 'SCRAPER_DRIVER_POOL_SIZE', 2),
+                recycle_after=getattr(settings, 'SCRAPER_DRIVER_RECYCLE_AFTER', 20),
+                options_factory=fast_chrome_options if fast_load else default_chrome_options,
+                block_resources=fast_load
+            )
+            atexit.register(_shared_pool.close)
+        return _shared_pool
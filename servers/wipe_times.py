@@ -0,0 +1,101 @@
+from datetime import timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+# Slots are stored per hour, like the "4pm est" strings they replaced
+SLOT_MINUTES = 60
+
+# Display zone for the derived day/hour strings, loaded once instead of per row
+DISPLAY_TIMEZONE = ZoneInfo('America/New_York')
+DISPLAY_SUFFIX = 'est'
+
+
+def minute_of_week(dt):
+    """Minutes since Monday 00:00 UTC of an aware datetime."""
+    dt = dt.astimezone(dt_timezone.utc)
+    return dt.weekday() * MINUTES_PER_DAY + dt.hour * 60 + dt.minute
+
+
+def schedule_minute(dt):
+    """The weekly slot a wipe at `dt` is stored under: its UTC minute of week, truncated to the hour."""
+    return minute_of_week(dt) // SLOT_MINUTES * SLOT_MINUTES
+
+
+def next_occurrence(minute, after):
+    """First UTC datetime at or after `after` that falls on `minute` of the week."""
+    after = after.astimezone(dt_timezone.utc).replace(second=0, microsecond=0)
+    delta = (minute - minute_of_week(after)) % MINUTES_PER_WEEK
+    return after + timedelta(minutes=delta)
+
+
+def minute_ranges(start, end):
+    """Half-open [low, high) minute-of-week ranges covering start..end; two when the window wraps."""
+    span = (end - start).total_seconds() / 60
+    if span >= MINUTES_PER_WEEK:
+        return [(0, MINUTES_PER_WEEK)]
+    low = minute_of_week(start)
+    high = low + int(-(-span // 1))
+    if high <= MINUTES_PER_WEEK:
+        return [(low, high)]
+    return [(low, MINUTES_PER_WEEK), (0, high - MINUTES_PER_WEEK)]
+
+
+def format_wipe_hour(dt):
+    """Display hour like "4pm est"."""
+    hour = dt.astimezone(DISPLAY_TIMEZONE).strftime('%I%p').lstrip('0').lower()
+    return f"{hour} {DISPLAY_SUFFIX}"
+
+
+def format_wipe_day(dt):
+    """Display weekday like "Thursday", in the same zone as format_wipe_hour."""
+    return dt.astimezone(DISPLAY_TIMEZONE).strftime('%A')
+
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def parse_display_day(value):
+    """Weekday index (Monday = 0) for a name like "thursday", or None."""
+    value = (value or '').strip().capitalize()
+    return DAYS.index(value) if value in DAYS else None
+
+
+def parse_display_hour(value):
+    """Hour 0-23 for "4pm", "4pm est" or "16", or None."""
+    value = (value or '').strip().lower()
+    if value.endswith(DISPLAY_SUFFIX):
+        value = value[:-len(DISPLAY_SUFFIX)].strip()
+    suffix = value[-2:]
+    if suffix in ('am', 'pm'):
+        value = value[:-2]
+    if not value.isdigit():
+        return None
+    hour = int(value)
+    if suffix in ('am', 'pm'):
+        if not 1 <= hour <= 12:
+            return None
+        return hour % 12 + (12 if suffix == 'pm' else 0)
+    return hour if hour < 24 else None
+
+
+def _display_offset(now):
+    """Minutes the display zone is ahead of UTC at `now` (negative for US/Eastern)."""
+    return int(now.astimezone(DISPLAY_TIMEZONE).utcoffset().total_seconds() // 60)
+
+
+def display_day_ranges(day, now):
+    """UTC minute-of-week ranges of one display-zone weekday, at the zone's current offset."""
+    low = (day * MINUTES_PER_DAY - _display_offset(now)) % MINUTES_PER_WEEK
+    high = low + MINUTES_PER_DAY
+    if high <= MINUTES_PER_WEEK:
+        return [(low, high)]
+    return [(low, MINUTES_PER_WEEK), (0, high - MINUTES_PER_WEEK)]
+
+
+def display_hour_minutes(hour, now, day=None):
+    """UTC wipe_minute values of a display-zone hour, on one weekday or on all seven."""
+    days = range(7) if day is None else [day]
+    offset = _display_offset(now)
+    return [(day * MINUTES_PER_DAY + hour * 60 - offset) % MINUTES_PER_WEEK for day in days]